@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from urn.evaluation import item_factor
+from urn.parsing import BuildComputation, make_parser
+
+# Rounds for each benchmark (each round evaluates from scratch)
+ROUNDS = 5
+
+
+@pytest.fixture(scope="session")
+def parser():
+    return make_parser()
+
+
+@pytest.fixture
+def run_query(benchmark, parser):
+    """Benchmark a function of the finalised computation for the query.
+
+    Parsing is not timed, and memoised item factors are cleared before
+    each round so that every round does the same work.
+    """
+
+    def run(query, function, rounds=ROUNDS):
+        def setup():
+            item_factor.cache_clear()
+            build = BuildComputation().transform(parser.parse(query))
+            build.computation.finalise()
+            return (build.computation,), {}
+
+        return benchmark.pedantic(function, setup=setup, rounds=rounds, iterations=1)
+
+    return run
@@ -0,0 +1,87 @@
+"""Benchmarks of `evaluate` along each scaling axis and evaluation path."""
+import pytest
+
+from urn.evaluation import evaluate
+from urn.polynomial import BACKENDS, BackendError, get_backend
+
+
+def installed_backends():
+    for name in BACKENDS:
+        try:
+            get_backend(name)
+        except BackendError:
+            continue
+        yield name
+
+
+def collection(n_items, count):
+    return ", ".join(f"item{i}={count}" for i in range(n_items))
+
+
+@pytest.mark.parametrize("backend", list(installed_backends()))
+@pytest.mark.parametrize("count", [100, 1_000, 10_000])
+def test_collection_size(run_query, backend, count):
+    query = (
+        f"PROBABILITY DRAW 200 FROM {collection(4, count)} "
+        "WHERE item0 >= 20 AND item1 <= 60 OR item2 >= 70;"
+    )
+    run_query(query, lambda computation: evaluate(computation, backend=backend))
+
+
+@pytest.mark.parametrize("n_items", [4, 16, 64])
+def test_distinct_items(run_query, n_items):
+    constraints = " AND ".join(f"item{i} >= 1" for i in range(0, n_items, 2))
+    query = f"COUNT DRAW 10..60 FROM {collection(n_items, 7)} WHERE {constraints};"
+    run_query(query, evaluate)
+
+
+@pytest.mark.parametrize("n_disjuncts", [2, 4, 8])
+def test_disjuncts(run_query, n_disjuncts):
+    constraints = " OR ".join(
+        f"item{i} >= {3 + i % 3} AND item{(i + 1) % 8} <= 4" for i in range(n_disjuncts)
+    )
+    query = f"PROBABILITY DRAW 40 FROM {collection(8, 20)} WHERE {constraints};"
+    run_query(query, evaluate)
+
+
+@pytest.mark.parametrize("width", [1, 10, 100])
+def test_draw_range_width(run_query, width):
+    query = (
+        f"PROBABILITY DRAW 100..{99 + width} FROM {collection(5, 200)} "
+        "WHERE item0 >= 30 OR item1 = 20;"
+    )
+    run_query(query, evaluate)
+
+
+@pytest.mark.parametrize("replacement", ["", "WITH REPLACEMENT"])
+@pytest.mark.parametrize("size", [50, 200])
+def test_replacement(run_query, replacement, size):
+    query = (
+        f"PROBABILITY DRAW {size} {replacement} FROM {collection(4, 50)} "
+        f"WHERE item0 >= {size // 8} AND item1 <= {size // 3} OR item2 >= {size // 4};"
+    )
+    run_query(query, evaluate)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        pytest.param(
+            "PROBABILITY DRAW 500 FROM a=5000, b=3000, c=2000 "
+            "WHERE a >= 260 AND b <= 150 SHOW FLOAT FAST;",
+            id="approximate",
+        ),
+        pytest.param(
+            "ESTIMATE DRAW 50 FROM a=500, b=300, c=200 "
+            "WHERE a >= 26 AND b <= 15 SAMPLES 100000 SEED 1;",
+            id="estimate",
+        ),
+        pytest.param(
+            "PROBABILITY DRAW 30..40 FROM a=1..40, b=300, c=200 "
+            "WHERE a >= 2 AND b <= 15;",
+            id="sweep",
+        ),
+    ],
+)
+def test_evaluation_path(run_query, query):
+    run_query(query, evaluate)
@@ -0,0 +1,67 @@
+"""Benchmarks of formatting results and of starting the command line."""
+import io
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from urn.constants import OutputFormat
+from urn.evaluation import evaluate
+from urn.output import Output
+
+SRC = Path(__file__).parent.parent / "src"
+
+QUERY = "PROBABILITY DRAW 0..400 FROM a=300, b=200 WHERE a >= 40;"
+
+
+def evaluate_query(parser):
+    from urn.parsing import BuildComputation
+
+    build = BuildComputation().transform(parser.parse(QUERY))
+    build.computation.finalise()
+    return build.computation, evaluate(build.computation)
+
+
+@pytest.mark.parametrize(
+    "output_fmt",
+    [fmt for fmt in OutputFormat if fmt != OutputFormat.ARROW],
+    ids=lambda fmt: fmt.name,
+)
+def test_output_format(benchmark, parser, output_fmt):
+    computation, evaluation = evaluate_query(parser)
+    output = Output(output_fmt=output_fmt)
+    benchmark(output.output, computation, evaluation)
+
+
+@pytest.mark.parametrize(
+    "output_fmt",
+    [OutputFormat.CSV, OutputFormat.JSON, OutputFormat.ARROW],
+    ids=lambda fmt: fmt.name,
+)
+def test_write_format(benchmark, parser, output_fmt):
+    if output_fmt == OutputFormat.ARROW:
+        pytest.importorskip("pyarrow")
+    computation, evaluation = evaluate_query(parser)
+    output = Output(output_fmt=output_fmt, output_rational=True)
+    benchmark(lambda: output.write(computation, evaluation, io.BytesIO()))
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        pytest.param(["--version"], id="version"),
+        pytest.param(["--no-cache", "-c", "COUNT DRAW 2 FROM a=3, b=4;"], id="query"),
+    ],
+)
+def test_cli_startup(benchmark, args):
+    env = {**os.environ, "PYTHONPATH": str(SRC)}
+    command = [sys.executable, "-m", "urn.cli", *args]
+    benchmark.pedantic(
+        subprocess.run,
+        args=(command,),
+        kwargs={"check": True, "capture_output": True, "env": env},
+        rounds=5,
+        iterations=1,
+    )
@@ -1 +1,6 @@
 __version__ = "0.0.2"
+
+from urn.api import count, probability
+from urn.profiling import profiling
+
+__all__ = ["count", "probability", "profiling"]
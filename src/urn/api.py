@@ -0,0 +1,134 @@
+"""Python interface to evaluate computations without parsing queries.
+
+Constraints are given as a mapping from item name to the counts allowed
+in a draw, or a sequence of such mappings if any one of them may hold.
+The allowed counts are given as an int (exactly that count), a range,
+or a tuple (low, high) of inclusive bounds where None means unbounded:
+
+    >>> probability({"red": 5, "blue": 3}, {"red": (2, None)}, sizes=4)
+    array([0.92857143])
+
+Calls inside a `profiling` block (see `urn.profiling`) are profiled.
+
+"""
+import math
+from collections.abc import Iterable, Mapping, Sequence
+from fractions import Fraction
+from typing import TYPE_CHECKING
+
+from urn.computation import ComputationDescription
+from urn.constants import ComputationType
+from urn.constraint import ConstraintItem
+from urn.evaluation import evaluate
+from urn.profiling import phase
+
+if TYPE_CHECKING:
+    import numpy as np
+
+Bounds = int | range | tuple[int | None, int | None]
+Constraints = Mapping[str, Bounds] | Sequence[Mapping[str, Bounds]]
+
+
+def make_constraint(name: str, bounds: Bounds) -> ConstraintItem:
+    """Make constraint that the count of the item lies within the bounds."""
+    if isinstance(bounds, int) and not isinstance(bounds, bool):
+        return ConstraintItem(name, bounds, bounds + 1)
+    if isinstance(bounds, range):
+        if bounds.step != 1:
+            raise ValueError(f"Range of counts for '{name}' must have step 1")
+        return ConstraintItem(name, bounds.start, bounds.stop)
+    if isinstance(bounds, tuple) and len(bounds) == 2:
+        low, high = bounds
+        return ConstraintItem(
+            name, low or 0, math.inf if high is None else high + 1
+        )
+    raise TypeError(f"Invalid bounds for '{name}': {bounds!r}")
+
+
+def make_computation(
+    computation_type: ComputationType,
+    collection: Mapping[str, int],
+    constraints: Constraints | None,
+    sizes: int | Iterable[int] | None,
+    replacement: bool,
+    exact: bool,
+) -> ComputationDescription:
+    """Build and finalise the computation described by the arguments.
+
+    If no sizes are given, every size from 0 to the size of the collection
+    is used (sizes must be given if drawing with replacement).
+    """
+    if constraints is None:
+        disjuncts: Sequence[Mapping[str, Bounds]] = [{}]
+    elif isinstance(constraints, Mapping):
+        disjuncts = [constraints]
+    else:
+        disjuncts = constraints
+
+    if isinstance(sizes, int):
+        selection_range: range | list[int] | None = range(sizes, sizes + 1)
+    elif sizes is None:
+        selection_range = None if replacement else range(sum(collection.values()) + 1)
+    else:
+        selection_range = list(sizes)
+
+    computation = ComputationDescription(
+        computation_type=computation_type,
+        selection_range=selection_range,
+        collection=dict(collection),
+        constraints=[
+            [make_constraint(name, bounds) for name, bounds in disjunct.items()]
+            for disjunct in disjuncts
+        ],
+        with_replacement=replacement,
+        approximate=not exact,
+    )
+    with phase("finalise"):
+        computation.finalise()
+    return computation
+
+
+def as_array(values: list) -> "np.ndarray":
+    import numpy as np
+
+    return np.array([float(value) for value in values], dtype=np.float64)
+
+
+def probability(
+    collection: Mapping[str, int],
+    constraints: Constraints | None = None,
+    sizes: int | Iterable[int] | None = None,
+    replacement: bool = False,
+    exact: bool = False,
+    backend: str | None = None,
+) -> "np.ndarray | list[Fraction]":
+    """Probability that a draw of each size satisfies the constraints.
+
+    Return a NumPy array of floats, or a list of Fractions if `exact`.
+    """
+    computation = make_computation(
+        ComputationType.PROBABILITY, collection, constraints, sizes, replacement, exact
+    )
+    with phase("evaluate"):
+        result = evaluate(computation, backend=backend)
+    return result if exact else as_array(result)
+
+
+def count(
+    collection: Mapping[str, int],
+    constraints: Constraints | None = None,
+    sizes: int | Iterable[int] | None = None,
+    replacement: bool = False,
+    exact: bool = True,
+    backend: str | None = None,
+) -> "np.ndarray | list[int]":
+    """Number of draws of each size that satisfy the constraints.
+
+    Return a list of ints, or a NumPy array of floats if not `exact`.
+    """
+    computation = make_computation(
+        ComputationType.COUNT, collection, constraints, sizes, replacement, exact
+    )
+    with phase("evaluate"):
+        result = evaluate(computation, backend=backend)
+    return result if exact else as_array(result)
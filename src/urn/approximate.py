@@ -0,0 +1,281 @@
+"""Approximate evaluation of computations in floating point.
+
+Polynomials are normalised so that coefficient k is the probability
+that a draw of size k from the objects the polynomial covers satisfies
+their constraints. Coefficients then lie in [0, 1] no matter how large
+the collection is.
+
+Multiplying two normalised polynomials weights each pair of terms by
+the probability that a draw of size k splits into j objects from the
+first polynomial and k-j from the second. That is the hypergeometric
+distribution without replacement and the binomial distribution with
+replacement. The weights are found from log-gamma values, so that no
+intermediate value overflows.
+"""
+import math
+from collections import Counter
+from dataclasses import dataclass
+
+import numpy as np
+
+from urn.computation import ComputationDescription
+from urn.constants import ComputationType
+from urn.deadline import check_time
+from urn.evaluation import item_degree_ranges, make_constraint_terms
+
+EPSILON = float(np.finfo(np.float64).eps)
+
+
+@dataclass(frozen=True)
+class Approximation:
+    """Floating point value with a bound on its absolute error."""
+
+    value: float
+    error: float
+
+    def __float__(self) -> float:
+        return self.value
+
+    def __str__(self) -> str:
+        return f"{self.value:g}"
+
+
+@dataclass
+class NormalisedPolynomial:
+    """Polynomial with coefficients normalised by the number of draws.
+
+    The `size` is the number of objects covered by the polynomial and
+    `rel_error` bounds the relative error of each coefficient.
+    """
+
+    coeffs: np.ndarray
+    size: int
+    rel_error: float = 0.0
+
+
+def log_factorials(n: int) -> np.ndarray:
+    """Array of log(k!) for k in 0..n-1."""
+    return np.array([math.lgamma(k + 1) for k in range(n)])
+
+
+def lgamma_error(n: int) -> float:
+    """Bound on the absolute error of `math.lgamma(n + 1)`, which is within
+    a couple of units in the last place of its value.
+    """
+    return 2 * EPSILON * max(math.lgamma(n + 1), 1.0)
+
+
+def log_weights(
+    size: int, total: int, length: int, with_replacement: bool
+) -> np.ndarray:
+    """Log of weight for degrees 0..length-1 of a polynomial covering `size`
+    objects out of a `total` being multiplied.
+
+    The weight for a pair of degrees j, k-j is the product of the weights
+    of each, divided by the weight for total degree k (see `multiply`).
+    """
+    degrees = np.arange(length)
+    if with_replacement:
+        share = size / total
+        log_share = math.log(share) if share > 0 else -math.inf
+        with np.errstate(invalid="ignore"):
+            weights = degrees * log_share - log_factorials(length)
+        weights[0] = 0.0
+        return weights
+    return np.array(
+        [
+            math.lgamma(size + 1) - math.lgamma(k + 1) - math.lgamma(size - k + 1)
+            if k <= size
+            else -math.inf
+            for k in degrees
+        ]
+    )
+
+
+def log_weights_error(
+    size: int, total: int, length: int, with_replacement: bool
+) -> float:
+    """Bound on the absolute error of the values of `log_weights`."""
+    degree = length - 1
+    if with_replacement:
+        # The error of the log of the share is multiplied by the degree
+        log_share = abs(math.log(size / total)) if size else 0.0
+        return 3 * EPSILON * degree * (log_share + 1) + 2 * lgamma_error(degree)
+    # Three log-gamma values, each at most log(size!), and two subtractions
+    return 4 * lgamma_error(size)
+
+
+def multiply(
+    a: NormalisedPolynomial,
+    b: NormalisedPolynomial,
+    bound: int,
+    with_replacement: bool,
+) -> NormalisedPolynomial:
+    """Multiply normalised polynomials, discarding terms of degree >= `bound`."""
+    size = a.size + b.size
+    length = min(len(a.coeffs) + len(b.coeffs) - 1, bound)
+    if not with_replacement:
+        length = min(length, size + 1)
+    if length <= 0 or size == 0:
+        coeffs = np.zeros(max(length, 0))
+        if length > 0:
+            coeffs[0] = a.coeffs[0] * b.coeffs[0]
+        rel_error = a.rel_error + b.rel_error + EPSILON
+        return NormalisedPolynomial(coeffs, size, rel_error)
+
+    wa = log_weights(a.size, size, len(a.coeffs), with_replacement)
+    wb = log_weights(b.size, size, len(b.coeffs), with_replacement)
+    if with_replacement:
+        wc = -log_factorials(length)
+    else:
+        wc = log_weights(size, size, length, with_replacement=False)
+
+    xa = np.flatnonzero(a.coeffs)
+    coeffs = np.zeros(length)
+    for k in range(length):
+        j = xa[(xa <= k) & (xa > k - len(b.coeffs))]
+        if not len(j):
+            continue
+        weights = np.exp(wa[j] + wb[k - j] - wc[k])
+        coeffs[k] = np.dot(a.coeffs[j] * b.coeffs[k - j], weights)
+
+    # Error of the exponents: from the log weights and from adding them
+    finite = [np.abs(w[np.isfinite(w)]).max(initial=0.0) for w in (wa, wb, wc)]
+    log_error = (
+        log_weights_error(a.size, size, len(a.coeffs), with_replacement)
+        + log_weights_error(b.size, size, len(b.coeffs), with_replacement)
+        + log_weights_error(size, size, length, with_replacement)
+        + 2 * EPSILON * sum(finite)
+    )
+    rel_error = a.rel_error + b.rel_error + a.rel_error * b.rel_error
+    rel_error += (1 + rel_error) * (math.expm1(log_error) + EPSILON * (length + 4))
+    return NormalisedPolynomial(coeffs, size, rel_error)
+
+
+def power(
+    poly: NormalisedPolynomial, k: int, bound: int, with_replacement: bool
+) -> NormalisedPolynomial:
+    """Raise normalised polynomial to the power `k` by repeated squaring."""
+    result = NormalisedPolynomial(np.ones(1), 0)
+    while k:
+        if k & 1:
+            result = multiply(result, poly, bound, with_replacement)
+        k >>= 1
+        if k:
+            poly = multiply(poly, poly, bound, with_replacement)
+    return result
+
+
+def product(
+    polys: list[NormalisedPolynomial], bound: int, with_replacement: bool
+) -> NormalisedPolynomial:
+    """Multiply normalised polynomials in a balanced product tree."""
+    if not polys:
+        return NormalisedPolynomial(np.ones(1), 0)
+    while len(polys) > 1:
+        pairs = [polys[i:i+2] for i in range(0, len(polys), 2)]
+        polys = [
+            multiply(pair[0], pair[1], bound, with_replacement)
+            if len(pair) == 2
+            else pair[0]
+            for pair in pairs
+        ]
+    return polys[0]
+
+
+def item_polynomial(degrees: range, item_count: int) -> NormalisedPolynomial:
+    """Normalised polynomial for an item: any count in `degrees` is allowed."""
+    coeffs = np.zeros(max(degrees.stop, 1))
+    coeffs[degrees.start:degrees.stop] = 1.0
+    return NormalisedPolynomial(coeffs, item_count)
+
+
+def log_total_draws(computation: ComputationDescription, size: int) -> float:
+    """Log of the number of possible draws of the given size."""
+    total = computation.collection_size()
+    if computation.with_replacement:
+        if not size:
+            return 0.0
+        # No draws of a positive size from an empty collection
+        return size * math.log(total) if total else -math.inf
+    return (
+        math.lgamma(total + 1)
+        - math.lgamma(size + 1)
+        - math.lgamma(total - size + 1)
+    )
+
+
+def log_total_draws_error(computation: ComputationDescription, size: int) -> float:
+    """Bound on the absolute error of `log_total_draws`."""
+    total = computation.collection_size()
+    if computation.with_replacement:
+        return 3 * EPSILON * size * abs(math.log(total)) if total else 0.0
+    return 4 * lgamma_error(total)
+
+
+def evaluate_approximate(computation: ComputationDescription) -> list[Approximation]:
+    """Evaluate the computation in floating point.
+
+    Each value is returned with a bound on its absolute error.
+    """
+    assert computation.selection_range is not None
+
+    plan = computation.reduced()
+    _, selection_upper_bound = computation.selection_size_bounds()
+    with_replacement = computation.with_replacement
+
+    values = np.zeros(selection_upper_bound)
+    magnitudes = np.zeros(selection_upper_bound)
+    rel_error = 0.0
+    n_terms = 0
+    for sign, constraints in make_constraint_terms(plan):
+        check_time()
+        groups = Counter(
+            item_degree_ranges(
+                plan.collection,
+                constraints,
+                selection_upper_bound,
+                with_replacement=with_replacement,
+            )
+        )
+        factors = [
+            power(
+                item_polynomial(degrees, item_count),
+                k,
+                selection_upper_bound,
+                with_replacement,
+            )
+            for (item_count, degrees), k in groups.items()
+        ]
+        term = product(factors, selection_upper_bound, with_replacement)
+        coeffs = np.zeros(selection_upper_bound)
+        coeffs[:len(term.coeffs)] = term.coeffs
+        values += sign * coeffs
+        magnitudes += coeffs
+        rel_error = max(rel_error, term.rel_error)
+        n_terms += 1
+
+    # Error from the terms themselves and from summing them
+    errors = magnitudes * (rel_error + n_terms * EPSILON)
+
+    results = []
+    for size in computation.selection_range:
+        value, error = float(values[size]), float(errors[size])
+        if value == error == 0.0:
+            # No draws count, however many draws there are
+            results.append(Approximation(0.0, 0.0))
+            continue
+        if computation.computation_type == ComputationType.COUNT:
+            log_total = log_total_draws(computation, size)
+            try:
+                scale = math.exp(log_total)
+            except OverflowError:
+                scale = math.inf
+            # Error of the scale: from the log-gamma values and from `exp`
+            scale_error = (
+                math.expm1(log_total_draws_error(computation, size)) + 2 * EPSILON
+            )
+            error = (error + abs(value) * (scale_error + EPSILON)) * scale
+            value *= scale
+        results.append(Approximation(value, error))
+    return results
@@ -0,0 +1,142 @@
+"""Estimated cost of evaluating a computation.
+
+The cost of a query is estimated before it is evaluated, from the number
+of terms its constraint disjuncts need, the number of items, the degree
+of the products and the bit-length of their coefficients. A query whose
+estimated cost is over `--max-cost` is evaluated approximately if that
+is within the budget, and is rejected otherwise.
+
+The terms are counted by splitting the constraints as `evaluate` does.
+If that takes longer than `COUNT_TERMS_TIMEOUT`, the number of terms of
+the inclusion-exclusion principle is used as an upper bound instead.
+"""
+import dataclasses
+import math
+from dataclasses import dataclass
+
+from urn.computation import ComputationDescription, ComputationDescriptionError
+from urn.constants import ComputationType
+from urn.deadline import TimeLimitError, time_limit
+from urn.evaluation import make_constraint_terms
+
+# Bits in a machine word (the unit of the coefficient size in the cost)
+WORD_BITS = 64
+
+# Seconds to spend counting the terms of a computation before giving up
+COUNT_TERMS_TIMEOUT = 1.0
+
+
+class BudgetError(ComputationDescriptionError):
+    pass
+
+
+@dataclass(frozen=True)
+class Cost:
+    """Estimated work to evaluate a computation.
+
+    There are `terms` terms, each a product of up to `items` factors of
+    degree less than `degree` with coefficients of up to `bits` bits.
+    The terms are evaluated `repeats` times (once for each point of a
+    sweep, or for each sample when estimating). The `split` names how the
+    constraints are split into terms ("disjoint boxes" or
+    "inclusion-exclusion"), and is None if `terms` is an upper bound as
+    the terms took too long to count.
+    """
+
+    terms: int
+    items: int
+    degree: int
+    bits: int
+    repeats: int = 1
+    split: str | None = None
+
+    @property
+    def operations(self) -> int:
+        """Estimated number of operations: machine word operations to
+        multiply out the factors of each term (by schoolbook multiplication),
+        plus the work to split the constraints into terms, which can take
+        time quadratic in the number of terms.
+        """
+        words = max(1, math.ceil(self.bits / WORD_BITS))
+        products = self.repeats * self.terms * self.items * self.degree ** 2 * words
+        return products + self.terms ** 2 * self.items
+
+
+def count_terms(plan: ComputationDescription) -> tuple[int, str] | None:
+    """Count the terms `evaluate` sums for the reduced computation, and name
+    how the constraints are split into them. Return None if counting them
+    takes longer than `COUNT_TERMS_TIMEOUT`.
+    """
+    try:
+        with time_limit(COUNT_TERMS_TIMEOUT):
+            terms = make_constraint_terms(plan)
+            # Disjoint boxes are returned as a list, while terms of the
+            # inclusion-exclusion principle are generated
+            if isinstance(terms, list):
+                return len(terms), "disjoint boxes"
+            return sum(1 for _ in terms), "inclusion-exclusion"
+    except TimeLimitError:
+        return None
+
+
+def estimate_cost(computation: ComputationDescription) -> Cost:
+    """Estimate the work to evaluate the finalised computation."""
+    plan = computation.reduced()
+    n_disjuncts = len(plan.constraints)
+    _, bound = plan.selection_size_bounds()
+    repeats = math.prod(len(counts) for counts in plan.sweep.values())
+    if computation.computation_type == ComputationType.ESTIMATE:
+        assert computation.samples is not None
+        assert computation.selection_range is not None
+        # Each sampled draw is tested against every disjunct
+        return Cost(
+            terms=max(n_disjuncts, 1),
+            items=len(plan.collection),
+            degree=1,
+            bits=WORD_BITS,
+            repeats=repeats * computation.samples * len(computation.selection_range),
+        )
+    if (counted := count_terms(plan)) is not None:
+        terms, split = counted
+    else:
+        terms, split = 2 ** n_disjuncts - 1, None
+    return Cost(
+        terms=max(terms, 1),
+        items=len(plan.collection),
+        degree=bound,
+        bits=WORD_BITS if plan.approximate else plan.count_bits(bound - 1),
+        repeats=repeats,
+        split=split,
+    )
+
+
+def enforce_max_cost(
+    computation: ComputationDescription,
+    max_cost: float,
+    cost: Cost | None = None,
+) -> Cost:
+    """Check that the estimated cost of the computation (`cost`, if already
+    known) is within the budget. If it is not, but evaluating it
+    approximately would be, make the computation approximate. Otherwise
+    raise BudgetError.
+
+    Return the estimated cost of the computation as it will be evaluated.
+    """
+    if cost is None:
+        cost = estimate_cost(computation)
+    if cost.operations <= max_cost:
+        return cost
+    if (
+        not computation.approximate
+        and computation.computation_type != ComputationType.ESTIMATE
+    ):
+        # The terms are the same, but their coefficients fit in a word
+        approximate = dataclasses.replace(cost, bits=WORD_BITS)
+        if approximate.operations <= max_cost:
+            computation.approximate = True
+            return approximate
+    raise BudgetError(
+        f"Estimated cost of {cost.operations:.3g} operations is over the budget "
+        f"of {max_cost:.3g} ({cost.terms} terms of {cost.items} items, "
+        f"degree {cost.degree})."
+    )
@@ -0,0 +1,277 @@
+"""On-disk cache of evaluated computations.
+
+Results are stored in a SQLite database, keyed by a hash of a canonical
+form of the computation (see `canonical_form`). Queries that differ only
+in the order of items, spacing or redundant constraints share an entry.
+
+The database records the version of urn that wrote it and is cleared
+when opened by a different version. Least recently used entries are
+evicted to keep the cache within its size limits. If the database cannot
+be opened or used, a warning is printed and results are not cached.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from urn import __version__
+from urn.computation import ComputationDescription, ComputationDescriptionError
+from urn.constants import AGGREGATE_ITEM, ComputationType
+from urn.constraint import ConstraintItem, reduce_constraints
+
+if TYPE_CHECKING:
+    from typing_extensions import Self
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_BYTES = 64 * 2 ** 20
+
+# Seconds to wait for another process to release a lock on the database
+LOCK_TIMEOUT = 10.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+"""
+
+
+def default_cache_path() -> Path:
+    """Location of the cache database in the user's cache directory."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "urn" / "results.sqlite"
+
+
+def canonical_constraint(
+    constraint: ConstraintItem, limit: int
+) -> tuple[str, int, int]:
+    """Constraint as (name, min, max) with max clipped to the item limit."""
+    return constraint.name, constraint.min_, int(min(constraint.max_, limit))
+
+
+def canonical_form(computation: ComputationDescription) -> dict[str, Any] | None:
+    """JSON-serialisable form of the computation that determines its result.
+
+    Unconstrained items are merged (even a single one, whose name does not
+    matter) and the constraints in each disjunct are combined, clipped to
+    the possible counts of each item and sorted.
+    Return None if the result is random, so should not be cached.
+    """
+    if (
+        computation.computation_type == ComputationType.ESTIMATE
+        and computation.seed is None
+    ):
+        return None
+    plan = computation.reduced()
+    limits = plan.item_limits()
+    disjuncts = {
+        tuple(
+            sorted(
+                canonical_constraint(constraint, limits[name])
+                for name, constraint in reduce_constraints(disjunct).items()
+            )
+        )
+        for disjunct in plan.constraints
+    }
+    constrained = {name for disjunct in disjuncts for name, _, _ in disjunct}
+    constrained |= plan.sweep.keys()
+    collection = {
+        name: count for name, count in plan.collection.items() if name in constrained
+    }
+    if unconstrained := plan.collection_size() - sum(collection.values()):
+        collection[AGGREGATE_ITEM] = unconstrained
+    selection_range = (
+        None if plan.selection_range is None else list(plan.selection_range)
+    )
+    form: dict[str, Any] = {
+        "type": plan.computation_type.name,
+        "action": plan.computation_action.name,
+        "with_replacement": plan.with_replacement,
+        "approximate": plan.approximate,
+        "selection_range": selection_range,
+        "collection": sorted(collection.items()),
+        # Order of swept items sets the order of results, so is not sorted
+        "sweep": [(name, list(counts)) for name, counts in plan.sweep.items()],
+        "constraints": sorted(disjuncts),
+    }
+    if plan.computation_type == ComputationType.ESTIMATE:
+        form["samples"] = plan.samples
+        form["seed"] = plan.seed
+    return form
+
+
+def computation_key(computation: ComputationDescription) -> str | None:
+    """Hash of the canonical form of the computation (None if uncacheable)."""
+    if not computation.is_finalised:
+        raise ComputationDescriptionError(
+            "Computation must be finalised before it is cached."
+        )
+    form = canonical_form(computation)
+    if form is None:
+        return None
+    text = json.dumps(form, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultCache:
+    """Least recently used cache of results in a SQLite database.
+
+    The connection is opened when first needed. Pickling the cache keeps
+    only its settings, so it can be passed to worker processes.
+
+    If the database cannot be opened or used (it is not writable, or not
+    a SQLite database), a warning is printed once and the cache is
+    disabled: nothing is found in it and nothing is stored.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._connection: sqlite3.Connection | None = None
+        self.disabled = False
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {**self.__dict__, "_connection": None}
+
+    def __enter__(self) -> "Self":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT)
+            try:
+                with connection:
+                    connection.executescript(SCHEMA)
+                    row = connection.execute(
+                        "SELECT value FROM meta WHERE key = 'version'"
+                    ).fetchone()
+                    if row is None or row[0] != __version__:
+                        connection.execute("DELETE FROM results")
+                        connection.execute(
+                            "INSERT OR REPLACE INTO meta VALUES ('version', ?)",
+                            (__version__,),
+                        )
+            except sqlite3.Error:
+                connection.close()
+                raise
+            self._connection = connection
+        return self._connection
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def disable(self, error: Exception) -> None:
+        """Stop using the database after an error, with a warning."""
+        print(
+            f"Cache error: {error} ({self.path}); results are not cached.",
+            file=sys.stderr,
+        )
+        self.disabled = True
+        self.close()
+
+    def get(self, key: str) -> Any | None:
+        """Return the value stored for the key, or None if there is none."""
+        if self.disabled:
+            return None
+        try:
+            with self.connection as connection:
+                row = connection.execute(
+                    "SELECT value FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                connection.execute(
+                    "UPDATE results SET last_used = ? WHERE key = ?",
+                    (time.time_ns(), key),
+                )
+        except (OSError, sqlite3.Error) as error:
+            self.disable(error)
+            return None
+        return pickle.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        """Store value for the key, evicting old entries if over the limits."""
+        if self.disabled:
+            return
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        try:
+            with self.connection as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                    (key, blob, len(blob), time.time_ns()),
+                )
+                self._evict(connection)
+        except (OSError, sqlite3.Error) as error:
+            self.disable(error)
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        n_entries, n_bytes = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()
+        if n_entries <= self.max_entries and n_bytes <= self.max_bytes:
+            return
+        evicted = []
+        rows = connection.execute(
+            "SELECT key, size FROM results ORDER BY last_used"
+        )
+        for key, size in rows:
+            if n_entries <= self.max_entries and n_bytes <= self.max_bytes:
+                break
+            evicted.append((key,))
+            n_entries -= 1
+            n_bytes -= size
+        connection.executemany("DELETE FROM results WHERE key = ?", evicted)
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        with self.connection as connection:
+            connection.execute("DELETE FROM results")
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+def evaluate_cached(
+    computation: ComputationDescription,
+    cache: ResultCache,
+    **options: Any,
+) -> list[Any]:
+    """Evaluate the computation, using the result in the cache if present.
+
+    Options are passed on to `urn.evaluation.evaluate`.
+    """
+    from urn.evaluation import evaluate
+
+    key = computation_key(computation)
+    if key is not None and (entry := cache.get(key)) is not None:
+        # Evaluation may fill in the selection sizes, so they are cached too
+        computation.selection_range, result = entry
+        return result
+    result = evaluate(computation, **options)
+    if key is not None:
+        cache.put(key, (computation.selection_range, result))
+    return result
@@ -1,9 +1,18 @@
 import argparse
+import itertools
 import sys
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any
 
 import lark
 
 from urn import __version__
+from urn.polynomial import BACKENDS, BackendError, get_backend
+
+if TYPE_CHECKING:
+    from urn.session import Session
 
 
 DESCRIPTION = "Multivariate hypergeometric calculator."
@@ -19,34 +28,293 @@ def parse_args() -> argparse.Namespace:
     command_source.add_argument(
         "-c", "--command", help="Command string to evaluate")
     command_source.add_argument(
-        "-f", "--filename", help="Read command string from file and evaluate")
+        "-f",
+        "--filename",
+        help="Read queries from file ('-' for stdin) and evaluate each in turn",
+    )
+    argparser.add_argument(
+        "--backend",
+        default="auto",
+        choices=["auto", *BACKENDS],
+        help="Polynomial arithmetic backend (default: fastest installed)",
+    )
+    argparser.add_argument(
+        "--approximate",
+        action="store_true",
+        help="Compute in floating point with error bounds (same as SHOW FLOAT FAST)",
+    )
+    argparser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes to share the work of evaluation between",
+    )
+    argparser.add_argument(
+        "-o",
+        "--output",
+        type=argparse.FileType("wb"),
+        help="Write results to this file ('-' for stdout) as they are formatted, "
+        "instead of printing them (needed for SHOW ARROW)",
+    )
+    argparser.add_argument(
+        "--max-cost",
+        type=float,
+        help="Evaluate queries whose estimated cost is over this many operations "
+        "approximately, or reject them if that is also over",
+    )
+    argparser.add_argument(
+        "--timeout",
+        type=float,
+        help="Stop evaluating a query after this many seconds",
+    )
+    argparser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print time spent in each phase and counts of work done to stderr",
+    )
+    cache_options = argparser.add_mutually_exclusive_group()
+    cache_options.add_argument(
+        "--cache-file",
+        help="Cache results in this SQLite database (default: in user cache directory)",
+    )
+    cache_options.add_argument(
+        "--no-cache", action="store_true", help="Do not cache results"
+    )
+    subcommands = argparser.add_subparsers(dest="subcommand")
+    serve = subcommands.add_parser(
+        "serve",
+        help="Evaluate JSON queries sent over HTTP by other programs",
+        description="Serve queries over HTTP on a local port or Unix socket, "
+        "evaluating them in a pool of --jobs processes.",
+    )
+    serve.add_argument(
+        "--host", default="127.0.0.1", help="Address to listen on (default: %(default)s)"
+    )
+    serve.add_argument(
+        "--port", type=int, default=8765, help="Port to listen on (default: %(default)s)"
+    )
+    serve.add_argument("--socket", help="Listen on this Unix socket instead of a port")
     return argparser.parse_args()
 
 
+QueryResult = tuple[str | None, str | None, str | None]
+
+
+def evaluate_query(
+    parser: lark.Lark, query: str, profile: bool = False, **options: Any
+) -> QueryResult:
+    """Evaluate query, returning its result or else an error message,
+    and the report of its profile if `profile` is true.
+    """
+    from urn.computation import ComputationDescriptionError
+    from urn.evaluation import process_query
+    from urn.profiling import Profile
+
+    query_profile = Profile() if profile else None
+    try:
+        result = process_query(parser, query, profile=query_profile, **options)
+    except lark.exceptions.LarkError as error:
+        return None, f"Command parsing error: {error}", None
+    except ComputationDescriptionError as error:
+        return None, f"Computation error: {error}", None
+    return result, None, query_profile and query_profile.report()
+
+
+# Parser of each worker process when evaluating queries in parallel
+_worker_parser: lark.Lark | None = None
+
+
+def _init_worker() -> None:
+    from urn.parsing import make_parser
+
+    global _worker_parser
+    _worker_parser = make_parser()
+
+
+def _evaluate_query_in_worker(query: str, options: dict[str, Any]) -> QueryResult:
+    assert _worker_parser is not None
+    return evaluate_query(_worker_parser, query, **options)
+
+
+def submit_query(
+    executor: ProcessPoolExecutor,
+    parser: lark.Lark,
+    session: "Session",
+    query: str,
+    options: dict[str, Any],
+) -> Future:
+    """Submit query to be evaluated by a worker process.
+
+    Named collections are defined in the session of this process, and a
+    copy of the collection is sent along with each query that uses it.
+    """
+    from urn.parsing import BuildComputation
+
+    try:
+        build = BuildComputation().transform(parser.parse(query))
+    except lark.exceptions.LarkError:
+        # The worker reports the error
+        return executor.submit(_evaluate_query_in_worker, query, options)
+    if build.defined_collection is not None:
+        future: Future = Future()
+        future.set_result(evaluate_query(parser, query, session=session, **options))
+        return future
+    if build.named_collection is not None:
+        options = {**options, "session": session.detached(build.named_collection)}
+    return executor.submit(_evaluate_query_in_worker, query, options)
+
+
+def evaluate_queries_in_pool(
+    parser: lark.Lark, queries: Iterable[str], jobs: int, options: dict[str, Any]
+) -> Iterator[QueryResult]:
+    """Evaluate queries in a pool of `jobs` processes, yielding results in
+    the order of the queries. Only a few queries are read ahead of the
+    results being yielded.
+    """
+    from urn.session import Session
+
+    session = Session()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as executor:
+        pending: deque[Future] = deque()
+        for query in queries:
+            pending.append(submit_query(executor, parser, session, query, options))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def run_batch(
+    parser: lark.Lark,
+    lines: Iterable[str],
+    jobs: int = 1,
+    **options: Any,
+) -> bool:
+    """Evaluate each query in the lines of text and print its result
+    as soon as it is ready.
+
+    With more than one job, a batch of several queries is shared between
+    processes, while a single query shares its own work between them.
+    Queries share a session, so they can define and use named collections
+    (see `urn.session`). If an `output_file` is given, results are written
+    there by `process_query` and queries are evaluated one at a time.
+    Errors (and profiles, if asked for) are printed to stderr, without
+    stopping the batch. Return True if every query succeeded.
+    """
+    from urn.parsing import split_queries
+    from urn.session import Session
+
+    queries = split_queries(lines)
+    head = list(itertools.islice(queries, 2))
+    queries = itertools.chain(head, queries)
+    if jobs > 1 and len(head) > 1 and options.get("output_file") is None:
+        results = evaluate_queries_in_pool(parser, queries, jobs, options)
+    else:
+        session = Session()
+        results = (
+            evaluate_query(parser, query, jobs=jobs, session=session, **options)
+            for query in queries
+        )
+
+    success = True
+    printed = False
+    for n, (result, error, report) in enumerate(results, start=1):
+        if report is not None:
+            print(f"Query {n} profile:\n{report}", file=sys.stderr)
+        if error is not None:
+            print(f"Query {n}: {error}", file=sys.stderr)
+            success = False
+            continue
+        if not result:
+            continue
+        if printed:
+            print()
+        print(result, flush=True)
+        printed = True
+    return success
+
+
 def main() -> None:
 
     args = parse_args()
 
     # Delay more expensive imports until needed.
+    from urn.parsing import make_parser
     from urn.shell import UrnShell
-    from urn.evaluation import process_query
 
-    parser = lark.Lark.open("grammar.lark", rel_to=__file__)
+    try:
+        get_backend(args.backend)
+    except BackendError as error:
+        print(f"Backend error: {error}", file=sys.stderr)
+        sys.exit(1)
+
+    parser = make_parser()
+
+    if args.no_cache:
+        cache = None
+    else:
+        from urn.cache import ResultCache, default_cache_path
+
+        cache = ResultCache(args.cache_file or default_cache_path())
+
+    output_file = None if args.subcommand == "serve" else args.output
+    batch_options = {
+        "backend": args.backend,
+        "approximate": args.approximate,
+        "jobs": args.jobs,
+        "cache": cache,
+        "profile": args.profile,
+        "max_cost": args.max_cost,
+        "timeout": args.timeout,
+    }
+    if output_file is not None:
+        batch_options["output_file"] = output_file
+    if args.subcommand == "serve":
+        import asyncio
+
+        from urn.server import serve
 
-    if args.command or args.filename:
-        
-        if args.filename:
-            with open(args.filename) as f:
-                command = f.read()
-        else:
-            command = args.command
         try:
-            print(process_query(parser, command))
-        except lark.exceptions.LarkError as error:
-            print(f"Command parsing error: {error}", file=sys.stderr)
-            sys.exit(1)
+            asyncio.run(
+                serve(
+                    host=args.host,
+                    port=args.port,
+                    socket_path=args.socket,
+                    **batch_options,
+                )
+            )
+        except KeyboardInterrupt:
+            pass
+        success = True
+    elif args.command:
+        success = run_batch(parser, [args.command], **batch_options)
+    elif args.filename == "-" or (args.filename is None and not sys.stdin.isatty()):
+        success = run_batch(parser, sys.stdin, **batch_options)
+    elif args.filename:
+        with open(args.filename) as f:
+            success = run_batch(parser, f, **batch_options)
     else:
-        UrnShell(parser=parser).cmdloop()
+        UrnShell(
+            parser=parser,
+            backend=args.backend,
+            approximate=args.approximate,
+            jobs=args.jobs,
+            cache=cache,
+            profile=args.profile,
+            max_cost=args.max_cost,
+            timeout=args.timeout,
+            output_file=output_file,
+        ).cmdloop()
+        success = True
+
+    if cache is not None:
+        cache.close()
+    if args.output is not None and args.output is not sys.stdout.buffer:
+        args.output.close()
+
+    if not success:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
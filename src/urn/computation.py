@@ -1,9 +1,11 @@
+import dataclasses
 import itertools
+import math
 from collections.abc import Mapping, Sequence
 from dataclasses import dataclass, field
 
 from urn.constraint import ConstraintItem
-from urn.constants import ComputationType, ComputationAction
+from urn.constants import AGGREGATE_ITEM, ComputationType, ComputationAction
 
 class ComputationDescriptionError(Exception):
     pass
@@ -15,14 +17,22 @@ class ComputationDescription:
 
     This class can be initialised and then modified, but the `finalise`
     method must be called before the described computation is evaluated.
+
+    Items in `sweep` take each of the given counts in turn, and the
+    computation is evaluated at every combination of counts. Their count
+    in `collection` is the largest count in the sweep.
     """
 
     computation_type: ComputationType = ComputationType.COUNT
     computation_action: ComputationAction = ComputationAction.DRAW
     selection_range: range | Sequence[int] | None = None
     collection: Mapping[str, int] = field(default_factory=dict)
+    sweep: Mapping[str, Sequence[int]] = field(default_factory=dict)
     constraints: Sequence[Sequence[ConstraintItem]] = field(default_factory=list)
     with_replacement: bool = False
+    approximate: bool = False
+    samples: int | None = None
+    seed: int | None = None
     is_finalised: bool = False
 
     def finalise(self) -> None:
@@ -30,6 +40,19 @@ class ComputationDescription:
 
         Check that computation is valid and modify attributes as required.
         """
+        # Swept items: check sweep and use largest count in collection
+        if self.sweep and self.selection_range is None:
+            raise ComputationDescriptionError(
+                "Must specify selection number if sweeping item counts."
+            )
+        if any(not counts for counts in self.sweep.values()):
+            raise ComputationDescriptionError("Item count sweeps must not be empty.")
+        if self.sweep:
+            self.collection = {
+                **self.collection,
+                **{name: max(counts) for name, counts in self.sweep.items()},
+            }
+
         # No constraints: constrain items by count if drawing without replacement
         if not self.constraints and not self.with_replacement:
             self.constraints = [
@@ -55,6 +78,33 @@ class ComputationDescription:
                 "Must specify selection number if drawing with replacement."
             )
 
+        if (
+            self.with_replacement
+            and self.computation_type != ComputationType.COUNT
+            and self.collection_size() == 0
+            and self.selection_range is not None
+            and max(self.selection_range, default=0) > 0
+        ):
+            raise ComputationDescriptionError(
+                "Probability is undefined when drawing with replacement "
+                "from an empty collection."
+            )
+
+        if self.approximate and self.selection_range is None:
+            raise ComputationDescriptionError(
+                "Must specify selection number if computing approximately."
+            )
+
+        if self.computation_type == ComputationType.ESTIMATE:
+            if self.selection_range is None:
+                raise ComputationDescriptionError(
+                    "Must specify selection number if estimating."
+                )
+            if not self.samples:
+                raise ComputationDescriptionError(
+                    "Must specify a positive number of samples if estimating."
+                )
+
         # Error if a constraint applies to an item not in the collection
         c_names = {c.name for c in itertools.chain.from_iterable(self.constraints)}
         if self.collection and (missing := c_names - self.collection.keys()):
@@ -64,6 +114,84 @@ class ComputationDescription:
 
         self.is_finalised = True
 
+    def reduced(self) -> "ComputationDescription":
+        """Return an equivalent computation with fewer items.
+
+        Constraints that every possible draw satisfies are dropped. Items
+        left without any constraint (and not swept) are then merged into a
+        single item whose count is their sum. Without replacement this
+        follows from Vandermonde's identity; with replacement each draw is
+        a choice from the combined count either way.
+
+        A computation without constraints (drawing with replacement) has a
+        single empty disjunct, as every draw counts.
+        """
+        if not self.is_finalised:
+            raise ComputationDescriptionError(
+                "Computation must be finalised before it is reduced."
+            )
+        limits = self.item_limits()
+        constraints = [
+            [
+                constraint
+                for constraint in disjunct
+                if constraint.min_ > 0 or constraint.max_ < limits[constraint.name]
+            ]
+            for disjunct in self.constraints
+        ]
+        if not constraints:
+            # Drawing with replacement without constraints: every draw counts
+            constraints = [[]]
+        c_names = {c.name for c in itertools.chain.from_iterable(constraints)}
+        c_names |= self.sweep.keys()
+        unconstrained = [name for name in self.collection if name not in c_names]
+        if len(unconstrained) < 2:
+            return dataclasses.replace(self, constraints=constraints)
+        collection = {
+            name: count
+            for name, count in self.collection.items()
+            if name in c_names
+        }
+        collection[AGGREGATE_ITEM] = sum(self.collection[n] for n in unconstrained)
+        return dataclasses.replace(
+            self, collection=collection, constraints=constraints
+        )
+
+    def sweep_points(self) -> list[dict[str, int]]:
+        """Counts of the swept items at each point of the sweep."""
+        names = list(self.sweep)
+        return [
+            dict(zip(names, counts, strict=True))
+            for counts in itertools.product(*self.sweep.values())
+        ]
+
+    def at_sweep_point(self, counts: Mapping[str, int]) -> "ComputationDescription":
+        """Return the computation with the swept items at the given counts.
+
+        Without replacement, selection sizes larger than the collection at
+        that point are left out.
+        """
+        computation = dataclasses.replace(
+            self, collection={**self.collection, **counts}, sweep={}
+        )
+        if not self.with_replacement:
+            assert self.selection_range is not None
+            size = computation.collection_size()
+            computation.selection_range = [
+                n for n in self.selection_range if n <= size
+            ]
+        return computation
+
+    def item_limits(self) -> dict[str, int]:
+        """Exclusive upper bound on the count of each item in a draw."""
+        _, selection_upper_bound = self.selection_size_bounds()
+        if self.with_replacement:
+            return {name: selection_upper_bound for name in self.collection}
+        return {
+            name: min(count + 1, selection_upper_bound)
+            for name, count in self.collection.items()
+        }
+
     def selection_size_bounds(self) -> tuple[int, int]:
         """Lower (inclusive) and upper (exclusive) bounds on selection size."""
         if self.selection_range is None:
@@ -73,12 +201,32 @@ class ComputationDescription:
         else:
             return min(self.selection_range), max(self.selection_range) + 1
 
+    def single_selection_size(self) -> int | None:
+        """The selection size if exactly one size is selected, else None."""
+        if self.selection_range is not None and len(self.selection_range) == 1:
+            return self.selection_range[0]
+        return None
+
     def collection_size(self) -> int:
         """Total number of items in collection."""
         if self.collection is None:
             raise ComputationDescriptionError("Collection is undefined.")
         return sum(self.collection.values())
 
+    def count_bits(self, size: int) -> int:
+        """Bit-length of the number of possible draws of the given size."""
+        total = self.collection_size()
+        if self.with_replacement:
+            log_draws = size * math.log2(total) if total else 0.0
+        else:
+            size = min(size, total)
+            log_draws = (
+                math.lgamma(total + 1)
+                - math.lgamma(size + 1)
+                - math.lgamma(total - size + 1)
+            ) / math.log(2)
+        return math.floor(log_draws) + 1
+
     def x_label(self) -> str:
         return f"{self.computation_action.name} size".lower()
 
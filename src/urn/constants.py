@@ -1,5 +1,11 @@
 from enum import Enum
 
-ComputationType = Enum("ComputationType", ["COUNT", "PROBABILITY"])
+ComputationType = Enum("ComputationType", ["COUNT", "PROBABILITY", "ESTIMATE"])
 ComputationAction = Enum("ComputationAction", ["DRAW"])
-OutputFormat = Enum("OutputFormat", ["TABLE", "PLOT"])
\ No newline at end of file
+OutputFormat = Enum(
+    "OutputFormat", ["TABLE", "PLOT", "HEATMAP", "CSV", "JSON", "ARROW"]
+)
+
+# Name of the item that stands in for all unconstrained items in a
+# reduced collection. It cannot clash with a name in a query.
+AGGREGATE_ITEM = "<other>"
@@ -1,8 +1,10 @@
 import itertools
 import math
-from collections.abc import Iterable, Sequence, Generator
+from collections.abc import Iterable, Mapping, Sequence, Generator
 from dataclasses import dataclass
 
+from urn.deadline import check_time
+
 
 @dataclass(eq=True)
 class ConstraintItem:
@@ -28,6 +30,10 @@ class ConstraintItem:
             max_=min(self.max_, other.max_),
         )
 
+    def is_empty(self) -> bool:
+        """True if no item count satisfies the constraint."""
+        return self.min_ >= self.max_
+
 
 def reduce_constraints(
     constraints: Iterable[ConstraintItem]
@@ -44,11 +50,120 @@ def reduce_constraints(
     return output
 
 
+def is_feasible(
+    constraints: Mapping[str, ConstraintItem],
+    limits: Mapping[str, int] | None = None,
+    size_bound: float = math.inf,
+) -> bool:
+    """Check whether some draw could satisfy all of the constraints.
+
+    The `limits` give an exclusive upper bound on the count of an item
+    and `size_bound` an exclusive upper bound on the size of the draw.
+    """
+    limits = limits or {}
+    if sum(constraint.min_ for constraint in constraints.values()) >= size_bound:
+        return False
+    return not any(
+        constraint.is_empty() or constraint.min_ >= limits.get(name, math.inf)
+        for name, constraint in constraints.items()
+    )
+
+
 def union_constraint_disjuncts(
-    seq: Sequence[Sequence[ConstraintItem]]
+    seq: Sequence[Sequence[ConstraintItem]],
+    limits: Mapping[str, int] | None = None,
+    size_bound: float = math.inf,
 ) -> Generator[tuple[int, dict[str, ConstraintItem]], None, None]:
-    """Return the union of each subsequence of constraint disjuncts."""
-    for n in range(1, len(seq) + 1):
-        combs = itertools.combinations(seq, n)
-        for cmb in combs:
-            yield n, reduce_constraints(itertools.chain.from_iterable(cmb))
+    """Return the union of each subsequence of constraint disjuncts.
+
+    Subsequences of length n are built by extending those of length n-1,
+    reusing their union. Infeasible unions (see `is_feasible`) are not
+    returned and are not extended, as no extension could be feasible.
+    """
+    disjuncts = [reduce_constraints(disjunct) for disjunct in seq]
+    level = [
+        (i, disjunct)
+        for i, disjunct in enumerate(disjuncts)
+        if is_feasible(disjunct, limits, size_bound)
+    ]
+    n = 1
+    while level:
+        yield from ((n, union) for _, union in level)
+        next_level = []
+        for last, union in level:
+            check_time()
+            for i in range(last + 1, len(disjuncts)):
+                extended = dict(union)
+                for name, constraint in disjuncts[i].items():
+                    extended[name] = (
+                        extended[name] & constraint if name in extended else constraint
+                    )
+                if is_feasible(extended, limits, size_bound):
+                    next_level.append((i, extended))
+        level = next_level
+        n += 1
+
+
+def subtract_constraint_box(
+    box: Mapping[str, ConstraintItem], other: Mapping[str, ConstraintItem]
+) -> list[dict[str, ConstraintItem]]:
+    """Split the part of `box` that lies outside `other` into disjoint boxes.
+
+    Both boxes must constrain the same item names.
+    """
+    if any((box[name] & other[name]).is_empty() for name in box):
+        return [dict(box)]
+    pieces = []
+    rest = dict(box)
+    for name, constraint in box.items():
+        split = [ConstraintItem(name, constraint.min_, other[name].min_)]
+        if other[name].max_ != math.inf:
+            # Nothing lies above an unbounded box
+            split.append(ConstraintItem(name, int(other[name].max_), constraint.max_))
+        for piece in split:
+            if not piece.is_empty():
+                pieces.append({**rest, name: piece})
+        rest[name] = constraint & other[name]
+    return pieces
+
+
+def disjoint_constraint_boxes(
+    seq: Sequence[Sequence[ConstraintItem]],
+    limits: Mapping[str, int],
+    max_boxes: int | None = None,
+) -> list[dict[str, ConstraintItem]] | None:
+    """Decompose the union of constraint disjuncts into disjoint boxes.
+
+    Each disjunct constrains the item counts to a box. The boxes returned
+    are pairwise disjoint and together cover the same item counts as the
+    disjuncts, so the count for the union is the sum of counts for boxes.
+
+    The `limits` give an exclusive upper bound on the count of an item
+    (items missing from `limits` are unbounded). Return None if more than
+    `max_boxes` boxes are needed.
+    """
+    names = list(dict.fromkeys(c.name for c in itertools.chain.from_iterable(seq)))
+    disjoint: list[dict[str, ConstraintItem]] = []
+    for disjunct in seq:
+        box = {
+            name: ConstraintItem(name, 0, limits.get(name, math.inf))
+            for name in names
+        }
+        for constraint in disjunct:
+            box[constraint.name] &= constraint
+        if any(constraint.is_empty() for constraint in box.values()):
+            continue
+        pieces = [box]
+        for existing in disjoint:
+            check_time()
+            pieces = [
+                piece
+                for remainder in pieces
+                for piece in subtract_constraint_box(remainder, existing)
+            ]
+            if not pieces:
+                break
+        disjoint.extend(pieces)
+        if max_boxes is not None and len(disjoint) > max_boxes:
+            return None
+    return disjoint
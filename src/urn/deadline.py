@@ -0,0 +1,55 @@
+"""Time limit on evaluation.
+
+Evaluation within `time_limit` checks the time at each term (and in other
+loops that can run for long) and stops with a `TimeLimitError` once the
+limit has passed:
+
+    >>> with time_limit(5.0):
+    ...     counts = count(deck, constraints)
+
+This module imports nothing else from urn, so that any module can check
+the time.
+"""
+import contextlib
+import time
+from collections.abc import Iterator
+from contextvars import ContextVar
+
+
+class TimeLimitError(Exception):
+    pass
+
+
+# Time (from `time.monotonic`) after which evaluation stops
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+@contextlib.contextmanager
+def time_limit(seconds: float | None) -> Iterator[None]:
+    """Stop evaluation within the block once the seconds have passed
+    (no limit if None). An enclosing limit that ends sooner still applies.
+    """
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> float | None:
+    """Seconds left before the current time limit, if there is one."""
+    if (deadline := _deadline.get()) is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def check_time() -> None:
+    """Raise TimeLimitError if the current time limit has passed."""
+    deadline = _deadline.get()
+    if deadline is not None and time.monotonic() > deadline:
+        raise TimeLimitError("Evaluation stopped at the time limit.")
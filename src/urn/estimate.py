@@ -0,0 +1,161 @@
+"""Monte Carlo estimation of probabilities.
+
+Draws are sampled in batches with NumPy and tested against every
+constraint disjunct at once. Each batch has its own seed spawned from
+the seed of the computation, so results do not depend on how batches
+are shared between worker processes.
+"""
+import math
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from urn.computation import ComputationDescription
+from urn.constraint import reduce_constraints
+from urn.deadline import check_time
+
+# Number of draws sampled at once
+BATCH_SIZE = 2 ** 14
+
+# Two-sided 95% quantile of the standard normal distribution
+Z_95 = 1.959963984540054
+
+
+@dataclass(frozen=True)
+class Estimate:
+    """Estimated probability with a 95% confidence interval."""
+
+    value: float
+    low: float
+    high: float
+
+    def __float__(self) -> float:
+        return self.value
+
+    def __str__(self) -> str:
+        return f"{self.value:g}"
+
+
+@dataclass(frozen=True)
+class SampleBatch:
+    """Batch of draws of one size to sample and test against constraints.
+
+    The `lows` and `highs` arrays hold the bounds [low, high) on the
+    count of each item (columns) for each constraint disjunct (rows).
+    """
+
+    size: int
+    n_samples: int
+    counts: np.ndarray
+    lows: np.ndarray
+    highs: np.ndarray
+    with_replacement: bool
+    seed: np.random.SeedSequence
+
+
+def count_hits(batch: SampleBatch) -> int:
+    """Sample the draws in the batch and count those meeting a constraint."""
+    rng = np.random.default_rng(batch.seed)
+    if batch.with_replacement:
+        draws = rng.multinomial(
+            batch.size, batch.counts / batch.counts.sum(), size=batch.n_samples
+        )
+    else:
+        draws = rng.multivariate_hypergeometric(
+            batch.counts, batch.size, size=batch.n_samples
+        )
+    hits = np.zeros(batch.n_samples, dtype=bool)
+    for low, high in zip(batch.lows, batch.highs, strict=True):
+        hits |= ((draws >= low) & (draws < high)).all(axis=1)
+    return int(hits.sum())
+
+
+def wilson_interval(hits: int, n: int, z: float = Z_95) -> tuple[float, float]:
+    """Wilson score interval for a binomial proportion."""
+    p = hits / n
+    denominator = 1 + z ** 2 / n
+    centre = (p + z ** 2 / (2 * n)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denominator
+    return max(0.0, centre - half_width), min(1.0, centre + half_width)
+
+
+def make_batches(computation: ComputationDescription) -> list[SampleBatch]:
+    """Split the samples for each selection size into batches."""
+    assert computation.selection_range is not None
+    assert computation.samples is not None
+
+    plan = computation.reduced()
+    names = list(plan.collection)
+    counts = np.array([plan.collection[name] for name in names], dtype=np.int64)
+    lows = np.zeros((len(plan.constraints), len(names)), dtype=np.int64)
+    highs = np.full_like(lows, np.iinfo(np.int64).max)
+    for row, disjunct in enumerate(plan.constraints):
+        for name, constraint in reduce_constraints(disjunct).items():
+            column = names.index(name)
+            lows[row, column] = constraint.min_
+            if constraint.max_ != math.inf:
+                highs[row, column] = constraint.max_
+
+    sizes = list(computation.selection_range)
+    n_batches = math.ceil(computation.samples / BATCH_SIZE)
+    seeds = np.random.SeedSequence(computation.seed).spawn(len(sizes) * n_batches)
+    batches = []
+    for i, size in enumerate(sizes):
+        for j in range(n_batches):
+            n_samples = min(BATCH_SIZE, computation.samples - j * BATCH_SIZE)
+            batches.append(
+                SampleBatch(
+                    size=size,
+                    n_samples=n_samples,
+                    counts=counts,
+                    lows=lows,
+                    highs=highs,
+                    with_replacement=computation.with_replacement,
+                    seed=seeds[i * n_batches + j],
+                )
+            )
+    return batches
+
+
+def count_all_hits(results: Iterable[int]) -> list[int]:
+    """Collect the hits of each batch, checking the time limit (see
+    `urn.deadline`) between batches.
+    """
+    hits = []
+    for batch_hits in results:
+        check_time()
+        hits.append(batch_hits)
+    return hits
+
+
+def evaluate_estimate(
+    computation: ComputationDescription, workers: int = 1
+) -> list[Estimate]:
+    """Estimate the probability of meeting the constraints by sampling.
+
+    Batches are sampled in `workers` processes (in this process if 1).
+    """
+    batches = make_batches(computation)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            try:
+                hits = count_all_hits(executor.map(count_hits, batches))
+            finally:
+                # Cancel the batches not yet started if stopped at a time limit
+                executor.shutdown(cancel_futures=True)
+    else:
+        hits = count_all_hits(map(count_hits, batches))
+
+    totals: dict[int, list[int]] = {}
+    for batch, batch_hits in zip(batches, hits, strict=True):
+        total = totals.setdefault(batch.size, [0, 0])
+        total[0] += batch_hits
+        total[1] += batch.n_samples
+
+    estimates = []
+    for size in computation.selection_range:  # type: ignore
+        size_hits, n = totals[size]
+        estimates.append(Estimate(size_hits / n, *wilson_interval(size_hits, n)))
+    return estimates
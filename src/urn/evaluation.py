@@ -1,170 +1,783 @@
-from collections.abc import Collection, Mapping
+import contextlib
+import functools
+import time
+from collections import Counter
+from collections.abc import (
+    Callable,
+    Collection,
+    Iterable,
+    Iterator,
+    Mapping,
+    Sequence,
+)
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from itertools import repeat
+from math import comb
+from typing import IO, TYPE_CHECKING, Any
 
 import lark
-from sympy import Poly, Rational, binomial, prod, factorial
-from sympy.abc import x
 
 from urn.computation import ComputationDescription, ComputationDescriptionError
-from urn.constraint import ConstraintItem, union_constraint_disjuncts
+from urn.constraint import (
+    ConstraintItem,
+    disjoint_constraint_boxes,
+    is_feasible,
+    union_constraint_disjuncts,
+)
+from urn.deadline import TimeLimitError, check_time, remaining_time, time_limit
 from urn.parsing import BuildComputation
+from urn.polynomial import ExponentialBackend, PolynomialBackend, get_backend
+from urn.profiling import (
+    Profile,
+    active_profile,
+    count_cached,
+    count_terms,
+    phase,
+    profiling,
+)
 from urn.constants import ComputationType, ComputationAction
 
+if TYPE_CHECKING:
+    from urn.cache import ResultCache
+    from urn.session import Session, TermProducts
 
-def degrees_to_polynomial_with_binomial_coeff(degrees: Collection[int], n: int) -> Poly:
+
+def degrees_to_polynomial_with_binomial_coeff(
+    degrees: Collection[int], n: int, backend: PolynomialBackend | None = None
+) -> Any:
     """For each degree `d`, create the polynomial with terms
     of degree `d` having binomial coefficient `bin(n, d)`:
 
         {0, 2, 5} -> bin(n, 5)*x**5 + bin(n, 2)*x**2 + 1
 
     """
-    coeffs = {degree: binomial(n, degree) for degree in degrees}
-    return Poly.from_dict(coeffs, x)
+    backend = backend or get_backend()
+    coeffs = [0] * (max(degrees, default=-1) + 1)
+    for degree in degrees:
+        coeffs[degree] = backend.binomial(n, degree)
+    return backend.from_coeffs(coeffs)
 
 
-def degrees_to_polynomial_with_fractional_coeff(
-    degrees: Collection[int], n: int
-) -> Poly:
-    """For each degree `d`, create the polynomial with those
-    terms with coefficient (n**d / d!) where n is the count
-    of the item in the collection:
+def degrees_to_polynomial_with_power_coeff(
+    degrees: Collection[int], n: int, backend: PolynomialBackend
+) -> Any:
+    """For each degree `d`, create the exponential generating function
+    with terms of degree `d` having coefficient `n**d` (the number of
+    sequences of `d` draws of an item with count `n`):
 
-        {5} -> (n**5 / 5!) * x**5
+        {0, 2} -> n**2 * x**2 / 2! + 1
 
     """
-    coeffs = {degree: Rational(n ** degree, factorial(degree)) for degree in degrees}
-    return Poly.from_dict(coeffs, x)
+    coeffs = [0] * (max(degrees, default=-1) + 1)
+    start = min(degrees, default=0)
+    power = n ** start
+    for degree in range(start, len(coeffs)):
+        if degree in degrees:
+            coeffs[degree] = power
+        power *= n
+    return backend.from_coeffs(coeffs)
 
 
-def make_count_draw_polynomials(
+def item_degree_ranges(
     collection: Mapping[str, int],
     constraints: Mapping[str, ConstraintItem],
     selection_upper_bound: int,
-) -> list[Poly]:
-    """Make polynomials for each item in when drawing WITHOUT replacement."""
-    polys = []
+    with_replacement: bool = False,
+) -> list[tuple[int, range]]:
+    """Pair the count of each item with the range of counts it can
+    have in a draw that satisfies the constraints.
+    """
+    ranges = []
     for item, item_count in collection.items():
+        max_ = selection_upper_bound
+        if not with_replacement:
+            max_ = min(max_, item_count + 1)
         if item in constraints:
             min_ = constraints[item].min_
-            max_ = min([item_count + 1, selection_upper_bound, constraints[item].max_])
+            max_ = min(max_, constraints[item].max_)
         else:
             min_ = 0
-            max_ = min([item_count + 1, selection_upper_bound])
-        polys.append(
-            degrees_to_polynomial_with_binomial_coeff(
-                range(min_, max_), item_count  # type: ignore
-            )
+        ranges.append((item_count, range(min_, max_)))  # type: ignore
+    return ranges
+
+
+def merge_unconstrained_ranges(
+    degree_ranges: Iterable[tuple[int, range]],
+    bound: int,
+    with_replacement: bool = False,
+) -> list[tuple[int, range]]:
+    """Merge the items that can have any count in a draw into one item
+    whose count is their sum (see `ComputationDescription.reduced`).
+    """
+
+    def limit(item_count: int) -> int:
+        return bound if with_replacement else min(item_count + 1, bound)
+
+    merged: list[tuple[int, range]] = []
+    free_count = 0
+    n_free = 0
+    for item_count, degrees in degree_ranges:
+        if degrees == range(limit(item_count)):
+            free_count += item_count
+            n_free += 1
+        else:
+            merged.append((item_count, degrees))
+    if n_free:
+        merged.append((free_count, range(limit(free_count))))
+    return merged
+
+
+def make_count_draw_polynomials(
+    collection: Mapping[str, int],
+    constraints: Mapping[str, ConstraintItem],
+    selection_upper_bound: int,
+    backend: PolynomialBackend | None = None,
+) -> list[Any]:
+    """Make polynomials for each item in when drawing WITHOUT replacement."""
+    return [
+        degrees_to_polynomial_with_binomial_coeff(degrees, item_count, backend)
+        for item_count, degrees in item_degree_ranges(
+            collection, constraints, selection_upper_bound
         )
-    return polys
+    ]
+
+
+# Maximum number of item factors kept by `item_factor`
+FACTOR_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=FACTOR_CACHE_SIZE)
+def item_factor(
+    backend: PolynomialBackend,
+    item_count: int,
+    degrees: range,
+    k: int,
+    bound: int,
+    with_replacement: bool,
+) -> Any:
+    """Polynomial for `k` items of the same count, each of which can
+    have any count in `degrees` in a draw.
+
+    Factors are memoised, so an item whose constraint is the same in many
+    terms (or queries) is only built once. Statistics are available from
+    `item_factor.cache_info()`. Polynomials are shared between callers and
+    must not be modified.
+    """
+    if with_replacement:
+        poly = degrees_to_polynomial_with_power_coeff(degrees, item_count, backend)
+    else:
+        poly = degrees_to_polynomial_with_binomial_coeff(degrees, item_count, backend)
+    return backend.power(poly, k, bound)
 
 
-def make_count_draw_with_replacement_polynomials(
+def make_grouped_factors(
+    degree_ranges: Iterable[tuple[int, range]],
+    backend: PolynomialBackend,
+    bound: int,
+    with_replacement: bool = False,
+) -> list[Any]:
+    """Make one factor for each group of items with the same count and
+    degree range, by raising their common polynomial to the group size.
+    """
+    with phase("factors"):
+        groups = Counter(degree_ranges)
+        hits = item_factor.cache_info().hits
+        factors = [
+            item_factor(backend, item_count, degrees, k, bound, with_replacement)
+            for (item_count, degrees), k in groups.items()
+        ]
+        count_cached(factors=item_factor.cache_info().hits - hits)
+        return factors
+
+
+def make_constraint_terms(
     computation: ComputationDescription,
-    constraints: Mapping[str, ConstraintItem],
-) -> list[Poly]:
-    """Make polynomials for each item in when drawing WITH replacement."""
-    polys = []
+) -> Iterable[tuple[int, dict[str, ConstraintItem]]]:
+    """Make signed terms whose sum of counts is the count for the constraints.
+
+    The union of the constraint disjuncts is split into disjoint boxes,
+    each counted once with sign +1. If that needs more boxes than the
+    inclusion-exclusion principle needs terms, the alternating sum over
+    intersections of disjuncts is used instead.
+    """
     _, selection_upper_bound = computation.selection_size_bounds()
-    for item, item_count in computation.collection.items():
-        if item in constraints:
-            min_ = constraints[item].min_
-            max_ = min(constraints[item].max_, selection_upper_bound)
-        else:
-            min_ = 0
-            max_ = selection_upper_bound
-        polys.append(
-            degrees_to_polynomial_with_fractional_coeff(
-                range(min_, max_),  # type: ignore
-                item_count,
+    limits = computation.item_limits()
+    boxes = disjoint_constraint_boxes(
+        computation.constraints,
+        limits=limits,
+        max_boxes=2 ** len(computation.constraints) - 1,
+    )
+    if boxes is not None:
+        return [
+            (1, box)
+            for box in boxes
+            if is_feasible(box, limits=limits, size_bound=selection_upper_bound)
+        ]
+    return (
+        ((-1) ** (n + 1), constraints)
+        for n, constraints in union_constraint_disjuncts(
+            computation.constraints,
+            limits=limits,
+            size_bound=selection_upper_bound,
+        )
+    )
+
+
+def accumulate(total: list[Any], coeffs: Sequence[Any], sign: int) -> None:
+    """Add `sign` times the coefficients to the running total in place."""
+    if len(coeffs) > len(total):
+        total.extend([0] * (len(coeffs) - len(total)))
+    for degree, coeff in enumerate(coeffs):
+        total[degree] += sign * coeff
+
+
+def sum_term_products(
+    terms: Iterable[tuple[int, list[Any]]],
+    backend: PolynomialBackend,
+    bound: int,
+    size: int | None = None,
+) -> list[Any]:
+    """Sum the product of factors of each term, multiplied by its sign,
+    and return the coefficients of the sum.
+
+    If `size` is given, only the coefficient of x**size is computed and
+    all lower coefficients are left as zero.
+    """
+    if size is not None:
+        total = [0] * (size + 1)
+        for sign, factors in terms:
+            check_time()
+            count_terms()
+            with phase("products"):
+                total[size] += sign * backend.coefficient(factors, size)
+        return total
+
+    total = []
+    for sign, factors in terms:
+        check_time()
+        count_terms()
+        with phase("products"):
+            product = backend.product(factors, bound=bound)
+            accumulate(total, backend.to_coeffs(product), sign)
+    return total
+
+
+def make_term_factors(
+    plan: ComputationDescription,
+    constraints: Mapping[str, ConstraintItem],
+    backend: PolynomialBackend,
+) -> list[Any]:
+    """Make the factors whose product counts draws meeting the constraints."""
+    _, selection_upper_bound = plan.selection_size_bounds()
+    return make_grouped_factors(
+        item_degree_ranges(
+            plan.collection,
+            constraints,
+            selection_upper_bound,
+            with_replacement=plan.with_replacement,
+        ),
+        backend=backend,
+        bound=selection_upper_bound,
+        with_replacement=plan.with_replacement,
+    )
+
+
+def sum_term_products_memoised(
+    plan: ComputationDescription,
+    terms: Iterable[tuple[int, Mapping[str, ConstraintItem]]],
+    backend: PolynomialBackend,
+    products: "TermProducts",
+    size: int | None = None,
+) -> list[Any]:
+    """Sum the signed products for each term like `sum_term_products`,
+    looking up the product of each term in `products` first.
+
+    Terms with the same item counts and degree ranges have the same
+    product, whatever the items are called, so products are shared
+    between queries on similar collections. Items left unconstrained by
+    a term are merged first, so that terms match however the rest of the
+    collection was reduced.
+    """
+    _, bound = plan.selection_size_bounds()
+    total: list[Any] = [0] * (size + 1) if size is not None else []
+    for sign, constraints in terms:
+        check_time()
+        degree_ranges = merge_unconstrained_ranges(
+            item_degree_ranges(
+                plan.collection,
+                constraints,
+                bound,
+                with_replacement=plan.with_replacement,
+            ),
+            bound,
+            with_replacement=plan.with_replacement,
+        )
+        key = (
+            backend,
+            bound,
+            size,
+            plan.with_replacement,
+            frozenset(Counter(degree_ranges).items()),
+        )
+        coeffs = products.get(key)
+        if coeffs is None:
+            factors = make_grouped_factors(
+                degree_ranges,
+                backend=backend,
+                bound=bound,
+                with_replacement=plan.with_replacement,
             )
+            coeffs = sum_term_products([(1, factors)], backend, bound, size)
+            products.put(key, coeffs)
+        else:
+            count_cached(products=1)
+        accumulate(total, coeffs, sign)
+    return total
+
+
+def get_plan_backend(
+    plan: ComputationDescription, backend: str | None = None
+) -> PolynomialBackend:
+    """Return the named backend to multiply the factors for the plan.
+
+    With replacement, draws are counted by exponential generating
+    functions, which are kept in integers by `ExponentialBackend`.
+    """
+    poly_backend = get_backend(backend)
+    if plan.with_replacement:
+        _, selection_upper_bound = plan.selection_size_bounds()
+        return ExponentialBackend(poly_backend, selection_upper_bound)
+    return poly_backend
+
+
+def sum_term_chunk(
+    plan: ComputationDescription,
+    terms: Iterable[tuple[int, Mapping[str, ConstraintItem]]],
+    backend: str | None = None,
+    size: int | None = None,
+) -> list[Any]:
+    """Sum the signed products for each term and return the coefficients."""
+    poly_backend = get_plan_backend(plan, backend)
+    _, selection_upper_bound = plan.selection_size_bounds()
+    return sum_term_products(
+        (
+            (sign, make_term_factors(plan, constraints, poly_backend))
+            for sign, constraints in terms
+        ),
+        backend=poly_backend,
+        bound=selection_upper_bound,
+        size=size,
+    )
+
+
+def call_in_worker(
+    function: Callable[..., Any],
+    profiled: bool,
+    timeout: float | None,
+    *args: Any,
+) -> tuple[Any, Profile | None]:
+    """Call function within the time limit (see `urn.deadline`), returning
+    its result and, if `profiled`, a profile of the work done.
+    """
+    with time_limit(timeout):
+        if not profiled:
+            return function(*args), None
+        with profiling() as profile:
+            return function(*args), profile
+
+
+def map_in_pool(
+    function: Callable[..., Any], workers: int, *iterables: Iterable[Any]
+) -> Iterator[Any]:
+    """Map function over the iterables in a pool of worker processes.
+
+    Calls stop at the current time limit, if there is one. If profiling,
+    the counts in the profile of each call are added to the active profile.
+    """
+    profile = active_profile()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result, worker_profile in executor.map(
+            call_in_worker,
+            repeat(function),
+            repeat(profile is not None),
+            repeat(remaining_time()),
+            *iterables,
+        ):
+            if profile is not None and worker_profile is not None:
+                profile.merge(worker_profile)
+            yield result
+
+
+def sum_terms(
+    plan: ComputationDescription,
+    terms: Iterable[tuple[int, Mapping[str, ConstraintItem]]],
+    backend: str | None = None,
+    size: int | None = None,
+    jobs: int = 1,
+    products: "TermProducts | None" = None,
+) -> list[Any]:
+    """Sum the signed products for each term and return the coefficients.
+
+    If `jobs` is more than 1, terms are shared between that many worker
+    processes and the sums from each are added together at the end
+    (along with the counts in their profiles, if profiling). Otherwise,
+    if `products` is given, the products of terms are looked up and
+    stored there.
+    """
+    if jobs <= 1 and products is not None:
+        return sum_term_products_memoised(
+            plan, terms, get_plan_backend(plan, backend), products, size
         )
-    return polys
+    if jobs <= 1:
+        return sum_term_chunk(plan, terms, backend, size)
+    terms = list(terms)
+    if len(terms) < 2:
+        return sum_term_chunk(plan, terms, backend, size)
+    chunks = [terms[i::jobs] for i in range(min(jobs, len(terms)))]
+    total: list[Any] = []
+    for coeffs in map_in_pool(
+        sum_term_chunk,
+        len(chunks),
+        repeat(plan),
+        chunks,
+        repeat(backend),
+        repeat(size),
+    ):
+        accumulate(total, coeffs, 1)
+    return total
 
 
-def evaluate(computation: ComputationDescription) -> list[Rational | int]:
-    """Evaluate the computation described by the object."""
+def evaluate(
+    computation: ComputationDescription,
+    backend: str | None = None,
+    jobs: int = 1,
+    products: "TermProducts | None" = None,
+) -> list[Any]:
+    """Evaluate the computation described by the object.
+
+    The `backend` names the polynomial backend to use (see `urn.polynomial`)
+    and `jobs` is the number of processes to share the work between.
+    Products of terms are kept in `products`, if given, for later
+    computations to reuse (see `urn.session`).
+    If the computation is approximate, floating point values are returned
+    with error bounds (see `urn.approximate`). Estimates are returned with
+    confidence intervals (see `urn.estimate`). If the computation sweeps
+    over item counts, a list of values is returned for each point of the
+    sweep (see `evaluate_sweep`).
+    """
     if not computation.is_finalised or computation.collection is None:
         raise ComputationDescriptionError(
             "Computation must be finalised before evaluation (use `finalise` method)"
         )
 
+    if computation.sweep:
+        return evaluate_sweep(computation, backend=backend, jobs=jobs)
+
+    if computation.computation_type == ComputationType.ESTIMATE:
+        from urn.estimate import evaluate_estimate
+
+        return evaluate_estimate(computation, workers=jobs)
+
+    if computation.approximate:
+        from urn.approximate import evaluate_approximate
+
+        return evaluate_approximate(computation)
+
+    if computation.computation_action != ComputationAction.DRAW:
+        raise NotImplementedError(computation.computation_action)
+
     if (
-        computation.computation_action == ComputationAction.DRAW
-        and computation.with_replacement is False
-    ):
-        _, selection_upper_bound = computation.selection_size_bounds()
-        poly = Poly(0, x)
-        for n, constraints in union_constraint_disjuncts(computation.constraints):
-            poly += (-1) ** (n + 1) * prod(
-                make_count_draw_polynomials(
-                    collection=computation.collection,
-                    constraints=constraints,
-                    selection_upper_bound=selection_upper_bound,
-                )
-            )
-        if computation.selection_range is not None:
-            counts = [poly.coeff_monomial(x ** y) for y in computation.selection_range]
-        else:
-            # Find implied selection sizes (monomials with non-zero coeffs)
-            pairs = [(power, coeff) for (power,), coeff in poly.as_dict().items()]
-            selection_range, counts = zip(*pairs)
-            computation.selection_range = selection_range
-
-        if computation.computation_type == ComputationType.COUNT:
-            return list(counts)  # type: ignore
-
-        if computation.computation_type == ComputationType.PROBABILITY:
-            total_items = computation.collection_size()
-            possibilities = [
-                binomial(total_items, y) for y in computation.selection_range
-            ]
-            return [c / p for c, p in zip(counts, possibilities, strict=True)]
-
-    elif (
-        computation.computation_action == ComputationAction.DRAW
-        and computation.with_replacement is True
+        computation.with_replacement
+        and computation.computation_type == ComputationType.COUNT
+        and not computation.constraints
     ):
         assert computation.selection_range is not None
-
         size = computation.collection_size()
-        total_unconstrained_draws = [size ** n for n in computation.selection_range]
-
-        if computation.computation_type == ComputationType.COUNT:
-            if not computation.constraints:
-                return total_unconstrained_draws
-
-        poly = Poly(0, x)
-        for n, constraints in union_constraint_disjuncts(computation.constraints):
-            poly += (-1) ** (n + 1) * prod(
-                make_count_draw_with_replacement_polynomials(
-                    computation=computation,
-                    constraints=constraints,
-                )
-            )
+        return [size ** n for n in computation.selection_range]
+
+    # Evaluate an equivalent computation with unconstrained items merged
+    plan = computation.reduced()
+    total = sum_terms(
+        plan,
+        make_constraint_terms(plan),
+        backend=backend,
+        size=computation.single_selection_size(),
+        jobs=jobs,
+        products=products,
+    )
 
-        coeffs = [poly.coeff_monomial(x ** y) for y in computation.selection_range]
-        factorials = [factorial(n) for n in computation.selection_range]
-        counts = [c * f for c, f in zip(coeffs, factorials, strict=True)]
+    if computation.selection_range is None:
+        # Find implied selection sizes (monomials with non-zero coeffs)
+        computation.selection_range = [
+            power for power, coeff in enumerate(total) if coeff
+        ]
 
-        if computation.computation_type == ComputationType.COUNT:
-            return counts
+    return coefficients_to_values(computation, total)
 
-        if computation.computation_type == ComputationType.PROBABILITY:
-            return [
-                count / total
-                for count, total in zip(counts, total_unconstrained_draws, strict=True)
-            ]
 
+def coefficients_to_values(
+    computation: ComputationDescription, coeffs: Sequence[Any]
+) -> list[Any]:
+    """Convert coefficients of the generating function for the draws to
+    the count or probability for each selection size.
+    """
+    assert computation.selection_range is not None
+
+    sizes = computation.selection_range
+    coeffs = [coeffs[y] if y < len(coeffs) else 0 for y in sizes]
+    total_items = computation.collection_size()
+    if computation.with_replacement:
+        possibilities = [total_items ** y for y in sizes]
     else:
-        raise NotImplementedError(computation.computation_action)
+        possibilities = [comb(total_items, y) for y in sizes]
+
+    if computation.computation_type == ComputationType.COUNT:
+        return coeffs
+
+    if computation.computation_type == ComputationType.PROBABILITY:
+        return [Fraction(c, p) for c, p in zip(coeffs, possibilities, strict=True)]
 
     raise NotImplementedError(computation.computation_type)
 
 
-def process_query(parser: lark.Lark, query: str) -> str:
-    """Parse query, build computation, evaulate and return result."""
+def sweep_term_products(
+    plan: ComputationDescription,
+    terms: Iterable[tuple[int, Mapping[str, ConstraintItem]]],
+    points: Sequence[Mapping[str, int]],
+    backend: PolynomialBackend,
+) -> list[list[Any]]:
+    """Sum the signed products for each term at each point of the sweep.
+
+    In each term, the product of factors for the items that are not swept
+    is the same at every point, so it is computed once. Only the factors
+    for the swept items are made for each point.
+    """
+    _, bound = plan.selection_size_bounds()
+    fixed_collection = {
+        name: count for name, count in plan.collection.items() if name not in plan.sweep
+    }
+    totals: list[list[Any]] = [[] for _ in points]
+    for sign, constraints in terms:
+        count_terms()
+        fixed_factors = make_grouped_factors(
+            item_degree_ranges(
+                fixed_collection,
+                constraints,
+                bound,
+                with_replacement=plan.with_replacement,
+            ),
+            backend=backend,
+            bound=bound,
+            with_replacement=plan.with_replacement,
+        )
+        with phase("products"):
+            fixed = backend.product(fixed_factors, bound=bound)
+        for total, point in zip(totals, points, strict=True):
+            check_time()
+            swept_factors = make_grouped_factors(
+                item_degree_ranges(
+                    point,
+                    constraints,
+                    bound,
+                    with_replacement=plan.with_replacement,
+                ),
+                backend=backend,
+                bound=bound,
+                with_replacement=plan.with_replacement,
+            )
+            with phase("products"):
+                product = backend.product([fixed, *swept_factors], bound=bound)
+                accumulate(total, backend.to_coeffs(product), sign)
+    return totals
+
+
+def sweep_term_chunk(
+    plan: ComputationDescription,
+    terms: Iterable[tuple[int, Mapping[str, ConstraintItem]]],
+    points: Sequence[Mapping[str, int]],
+    backend: str | None = None,
+) -> list[list[Any]]:
+    """Sum the signed products for each term at each of the points."""
+    return sweep_term_products(plan, terms, points, get_plan_backend(plan, backend))
+
+
+def sweep_terms(
+    plan: ComputationDescription,
+    terms: Iterable[tuple[int, Mapping[str, ConstraintItem]]],
+    points: Sequence[Mapping[str, int]],
+    backend: str | None = None,
+    jobs: int = 1,
+) -> list[list[Any]]:
+    """Sum the signed products for each term at each point of the sweep.
+
+    If `jobs` is more than 1, the points are shared between that many
+    worker processes (each of which multiplies out the factors that are
+    the same at every point once).
+    """
+    if jobs <= 1 or len(points) < 2:
+        return sweep_term_chunk(plan, terms, points, backend)
+    terms = list(terms)
+    n_chunks = min(jobs, len(points))
+    totals: list[list[Any]] = [[] for _ in points]
+    for i, chunk_totals in enumerate(
+        map_in_pool(
+            sweep_term_chunk,
+            n_chunks,
+            repeat(plan),
+            repeat(terms),
+            [points[i::n_chunks] for i in range(n_chunks)],
+            repeat(backend),
+        )
+    ):
+        totals[i::n_chunks] = chunk_totals
+    return totals
+
+
+def evaluate_sweep(
+    computation: ComputationDescription,
+    backend: str | None = None,
+    jobs: int = 1,
+) -> list[list[Any]]:
+    """Evaluate the computation at each point of its sweep over item counts.
+
+    Return a list of values for each point (see `sweep_points`), with one
+    value for each selection size. Sizes larger than the collection at a
+    point have the value None.
+    """
+    assert computation.selection_range is not None
+
+    points = computation.sweep_points()
+    point_computations = [computation.at_sweep_point(point) for point in points]
+
+    def align(point: ComputationDescription, values: Sequence[Any]) -> list[Any]:
+        lookup = dict(zip(point.selection_range, values, strict=True))  # type: ignore
+        return [lookup.get(size) for size in computation.selection_range]  # type: ignore
+
+    if computation.approximate or (
+        computation.computation_type == ComputationType.ESTIMATE
+    ):
+        return [
+            align(point, evaluate(point, backend=backend, jobs=jobs))
+            if point.selection_range
+            else align(point, [])
+            for point in point_computations
+        ]
+
+    plan = computation.reduced()
+    totals = sweep_terms(plan, make_constraint_terms(plan), points, backend, jobs)
+    return [
+        align(point, coefficients_to_values(point, total))
+        for point, total in zip(point_computations, totals, strict=True)
+    ]
+
+
+def process_query(
+    parser: lark.Lark,
+    query: str,
+    backend: str | None = None,
+    approximate: bool = False,
+    jobs: int = 1,
+    cache: "ResultCache | None" = None,
+    profile: Profile | None = None,
+    session: "Session | None" = None,
+    max_cost: float | None = None,
+    timeout: float | None = None,
+    output_file: IO[bytes] | None = None,
+) -> str:
+    """Parse query, build computation, evaulate and return result.
+
+    Named collections are defined and looked up in the `session`, which
+    also keeps the products of terms for later queries to reuse. A query
+    that defines a collection has an empty result. A query prefixed by
+    `EXPLAIN` returns the plan for evaluating it (see `urn.explain`).
+
+    A query whose estimated cost is over `max_cost` is evaluated
+    approximately if that is within the budget, or else rejected (see
+    `urn.budget`), and evaluation stops after `timeout` seconds.
+
+    If an `output_file` is given, the output is written to it (see
+    `Output.write`) rather than returned, and the result is empty unless
+    the query asks to SHOW TIMING.
+
+    If a `cache` is given, results are looked up and stored there. The
+    phases are timed in `profile` (or the active profile, see
+    `urn.profiling`) if there is one, or if the query asks to SHOW TIMING,
+    in which case the report is added to the result.
+    """
+    start = time.perf_counter()
     tree = parser.parse(query)
     builder = BuildComputation()
     build: BuildComputation = builder.transform(tree)
-    build.computation.finalise()
-    evaluation = evaluate(build.computation)
-    return build.output.output(build.computation, evaluation)
+    if build.defined_collection is not None or build.named_collection is not None:
+        if session is None:
+            raise ComputationDescriptionError(
+                "Named collections can only be used in a session."
+            )
+        if build.named_collection is not None:
+            session.use_collection(build.named_collection, build.computation)
+        if build.defined_collection is not None:
+            session.define(
+                build.defined_collection,
+                build.computation.collection,
+                build.computation.sweep,
+            )
+            return ""
+
+    if build.explain_plan:
+        from urn.explain import explain
+
+        build.computation.approximate |= approximate
+        build.computation.finalise()
+        return explain(build.computation, backend=backend, jobs=jobs, max_cost=max_cost)
+
+    profile = profile or active_profile()
+    if profile is None and build.output.show_timing:
+        profile = Profile()
+    if profile is not None:
+        profile.add_time("parse", time.perf_counter() - start)
+
+    products = session.products if session is not None else None
+    with contextlib.nullcontext() if profile is None else profiling(profile):
+        with phase("finalise"):
+            build.computation.approximate |= approximate
+            build.computation.finalise()
+            if max_cost is not None:
+                from urn.budget import enforce_max_cost
+
+                enforce_max_cost(build.computation, max_cost)
+        with phase("evaluate"), time_limit(timeout):
+            try:
+                if cache is not None:
+                    from urn.cache import evaluate_cached
+
+                    evaluation = evaluate_cached(
+                        build.computation,
+                        cache,
+                        backend=backend,
+                        jobs=jobs,
+                        products=products,
+                    )
+                else:
+                    evaluation = evaluate(
+                        build.computation,
+                        backend=backend,
+                        jobs=jobs,
+                        products=products,
+                    )
+            except TimeLimitError as error:
+                from urn.budget import BudgetError
+
+                raise BudgetError(str(error)) from None
+        with phase("format"):
+            if output_file is not None:
+                build.output.write(build.computation, evaluation, output_file)
+                output_file.flush()
+                result = ""
+            else:
+                result = build.output.output(build.computation, evaluation)
+
+    if build.output.show_timing:
+        assert profile is not None
+        result = f"{result}\n\n{profile.report()}" if result else profile.report()
+    return result
@@ -0,0 +1,117 @@
+"""Plan of how a computation will be evaluated (`EXPLAIN`).
+
+The plan shows the collection and constraints after reduction, the
+engine and backend that `evaluate` will use, the number of terms, the
+degree of the products and the estimated cost (see `urn.budget`), all
+without evaluating the computation.
+"""
+import dataclasses
+import math
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+from urn.budget import BudgetError, Cost, enforce_max_cost, estimate_cost
+from urn.computation import ComputationDescription
+from urn.constants import ComputationType
+from urn.constraint import ConstraintItem, reduce_constraints
+from urn.evaluation import get_plan_backend
+
+
+def format_constraint(constraint: ConstraintItem) -> str:
+    name, min_, max_ = constraint.name, constraint.min_, constraint.max_
+    if max_ == min_ + 1:
+        return f"{name} = {min_}"
+    if max_ == math.inf:
+        return f"{name} >= {min_}"
+    if min_ == 0:
+        return f"{name} < {max_}"
+    return f"{min_} <= {name} < {max_}"
+
+
+def format_disjunct(disjunct: Mapping[str, ConstraintItem]) -> str:
+    if not disjunct:
+        return "any draw"
+    return " AND ".join(format_constraint(c) for c in disjunct.values())
+
+
+def format_sizes(sizes: Sequence[int]) -> str:
+    if isinstance(sizes, range) and len(sizes) > 1:
+        return f"{sizes.start}..{sizes.stop - 1}"
+    return ", ".join(map(str, sizes))
+
+
+def format_terms(cost: Cost) -> str:
+    if cost.split is None:
+        return f"up to {cost.terms} (too many to count)"
+    return f"{cost.terms} ({cost.split})"
+
+
+def explain(
+    computation: ComputationDescription,
+    backend: str | None = None,
+    jobs: int = 1,
+    max_cost: float | None = None,
+) -> str:
+    """Describe how the finalised computation would be evaluated, as a
+    table of the steps of its plan.
+
+    If `max_cost` is given, the plan is the one evaluated within that
+    budget (see `urn.budget.enforce_max_cost`). The terms, degree and
+    operations shown are those of the estimated cost of the plan.
+    """
+    import tabulate
+
+    cost = estimate_cost(computation)
+    budget = None
+    if max_cost is not None:
+        budgeted = dataclasses.replace(computation)
+        try:
+            cost = enforce_max_cost(budgeted, max_cost, cost)
+        except BudgetError:
+            budget = f"{max_cost:.3g} (exceeded: the query is rejected)"
+        else:
+            budget = f"{max_cost:.3g}"
+            if budgeted.approximate and not computation.approximate:
+                budget += " (exceeded: evaluated in floating point)"
+            computation = budgeted
+
+    plan = computation.reduced()
+    rows: list[tuple[str, Any]] = []
+    multiplies = True
+    if computation.computation_type == ComputationType.ESTIMATE:
+        rows.append(("engine", f"sampling ({computation.samples} samples)"))
+        multiplies = False
+    elif computation.approximate:
+        rows.append(("engine", "floating point"))
+    elif (
+        computation.with_replacement
+        and computation.computation_type == ComputationType.COUNT
+        and not computation.constraints
+        and not computation.sweep
+    ):
+        rows.append(("engine", "closed form"))
+        multiplies = False
+    else:
+        rows.append(("engine", "exact"))
+        rows.append(("backend", get_plan_backend(plan, backend).name))
+    rows.append(("jobs", jobs))
+
+    rows.append(
+        ("collection", ", ".join(f"{n}={c}" for n, c in plan.collection.items()))
+    )
+    if plan.sweep:
+        sweep = ", ".join(f"{n}={format_sizes(c)}" for n, c in plan.sweep.items())
+        rows.append(("sweep", f"{sweep} ({cost.repeats} points)"))
+    for n, disjunct in enumerate(plan.constraints, start=1):
+        rows.append((f"disjunct {n}", format_disjunct(reduce_constraints(disjunct))))
+    if computation.selection_range is not None:
+        rows.append(("draw sizes", format_sizes(computation.selection_range)))
+
+    if multiplies:
+        rows.append(("terms", format_terms(cost)))
+        rows.append(("max degree", cost.degree - 1))
+        rows.append(("coefficient bits", cost.bits))
+    rows.append(("estimated operations", f"{cost.operations:.3g}"))
+    if budget is not None:
+        rows.append(("budget", budget))
+    return tabulate.tabulate(rows, headers=["plan", ""], disable_numparse=True)
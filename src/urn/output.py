@@ -1,13 +1,44 @@
-from collections.abc import Sequence
+import csv
+import io
+import itertools
+import json
+import math
+from collections.abc import Iterator, Sequence
 from dataclasses import dataclass
-from sympy import Rational
+from typing import IO, Any
 
-import tabulate
-import uniplot
-
-from urn.computation import ComputationDescription, ComputationType
+from urn.computation import (
+    ComputationDescription,
+    ComputationDescriptionError,
+    ComputationType,
+)
 from urn.constants import OutputFormat
 
+# Characters for increasing values in a heatmap
+HEATMAP_SHADES = " ░▒▓█"
+
+# Number of rows in each record batch of Arrow output
+ARROW_BATCH_ROWS = 4096
+
+
+def join_plot_lines(plt: str | Sequence[str]) -> str:
+    """Join lines of a plot (newer uniplot versions return a string)."""
+    return plt if isinstance(plt, str) else "\n".join(plt)
+
+
+def fits_int64(computation: ComputationDescription) -> bool:
+    """Whether every count of the computation (and the numerator and
+    denominator of every probability) fits in a signed 64-bit integer.
+    """
+    low, high = computation.selection_size_bounds()
+    if computation.with_replacement:
+        size = high - 1
+    else:
+        # The number of draws is largest for half the collection
+        size = min(max(computation.collection_size() // 2, low), high - 1)
+    # Leave a bit to spare, as `count_bits` is found in floating point
+    return computation.count_bits(size) < 63
+
 
 @dataclass
 class Output:
@@ -15,58 +46,407 @@ class Output:
 
     The `make_*` methods accept a computation description and a
     sequence of numerical values that is formatted as string to
-    be printed to the terminal.
+    be printed to the terminal. If the computation sweeps over item
+    counts, the sequence holds the values for each point of the sweep.
+
+    The `write` method writes the output to a binary file instead, one
+    row at a time for the machine-readable formats (CSV, JSON Lines and
+    Arrow), so that large results are never held as formatted strings.
     """
 
     output_fmt: OutputFormat = OutputFormat.TABLE
     output_rational: bool = False
+    # The timing report is added to the output by `process_query`
+    show_timing: bool = False
 
     def output(
-        self, computation: ComputationDescription, evaluation: Sequence[Rational | int]
+        self, computation: ComputationDescription, evaluation: Sequence[Any]
     ) -> str:
         if self.output_fmt == OutputFormat.PLOT:
             return self.make_plot(computation, evaluation)
+        elif self.output_fmt == OutputFormat.HEATMAP:
+            return self.make_heatmap(computation, evaluation)
+        elif self.output_fmt == OutputFormat.CSV:
+            return self.make_csv(computation, evaluation)
+        elif self.output_fmt == OutputFormat.JSON:
+            return self.make_json(computation, evaluation)
+        elif self.output_fmt == OutputFormat.ARROW:
+            raise ComputationDescriptionError(
+                "Arrow output is binary, so can only be written to a file "
+                "(use --output)."
+            )
+        elif computation.sweep:
+            return self.make_sweep_table(computation, evaluation)
         else:
             return self.make_table(computation, evaluation)
 
+    def value_headers(self, computation: ComputationDescription) -> list[str]:
+        """Headers of the columns that `format_value` fills."""
+        if computation.computation_type == ComputationType.ESTIMATE:
+            # Estimates carry a 95% confidence interval
+            return [computation.y_label(), "95% CI low", "95% CI high"]
+        if computation.approximate:
+            # Approximate values carry a bound on their error
+            return [computation.y_label(), "error bound"]
+        return [computation.y_label()]
+
+    def format_value(self, computation: ComputationDescription, value: Any) -> list[str]:
+        """Format value as a string for each column in `value_headers`."""
+        if computation.computation_type == ComputationType.ESTIMATE:
+            return [str(value), f"{value.low:g}", f"{value.high:g}"]
+        if computation.approximate:
+            return [str(value.value), f"{value.error:.1e}"]
+        if (
+            not self.output_rational
+            and computation.computation_type == ComputationType.PROBABILITY
+        ):
+            return [str(float(value))]
+        return [str(value)]
+
+    def record_fields(self, computation: ComputationDescription) -> list[str]:
+        """Names of the fields of each record (see `records`)."""
+        if (
+            self.output_rational
+            and computation.computation_type == ComputationType.PROBABILITY
+            and not computation.approximate
+        ):
+            value_fields = ["numerator", "denominator"]
+        else:
+            value_fields = self.value_headers(computation)
+        return [*computation.sweep, computation.x_label(), *value_fields]
+
+    def record_values(
+        self, computation: ComputationDescription, value: Any
+    ) -> list[Any]:
+        """Value as numbers for each value field of `record_fields`.
+
+        Exact probabilities are given as a float, or as their numerator
+        and denominator if rational output is asked for.
+        """
+        if computation.computation_type == ComputationType.ESTIMATE:
+            return [value.value, value.low, value.high]
+        if computation.approximate:
+            return [value.value, value.error]
+        if computation.computation_type == ComputationType.PROBABILITY:
+            if self.output_rational:
+                return [value.numerator, value.denominator]
+            return [float(value)]
+        return [value]
+
+    def records(
+        self, computation: ComputationDescription, evaluation: Sequence[Any]
+    ) -> Iterator[list[Any]]:
+        """Yield the counts of swept items, the selection size and the
+        value of each row, one row at a time (sizes with no value at a
+        point of the sweep are left out).
+        """
+        if computation.selection_range is None:
+            raise TypeError("selection range is None")
+        for point, values in zip(*self.sweep_grid(computation, evaluation)):
+            for size, value in zip(computation.selection_range, values, strict=True):
+                if value is not None:
+                    yield [
+                        *point.values(),
+                        size,
+                        *self.record_values(computation, value),
+                    ]
+
+    def format_cell(self, computation: ComputationDescription, value: Any) -> str:
+        """Format value as a single string, along with its error bound or
+        confidence interval if it has one.
+        """
+        if computation.computation_type == ComputationType.ESTIMATE:
+            _, low, high = self.format_value(computation, value)
+            return f"{value} [{low}, {high}]"
+        if computation.approximate:
+            _, error = self.format_value(computation, value)
+            return f"{value} ± {error}"
+        return self.format_value(computation, value)[0]
+
+    def sweep_grid(
+        self, computation: ComputationDescription, evaluation: Sequence[Any]
+    ) -> tuple[list[dict[str, int]], list[Sequence[Any]]]:
+        """Pair the counts of swept items with the values at each point
+        (a computation without a sweep has a single point).
+        """
+        if computation.sweep:
+            return computation.sweep_points(), list(evaluation)
+        return [{}], [evaluation]
+
     def make_table(
         self,
         computation: ComputationDescription,
-        evaluation: Sequence[Rational | int],
+        evaluation: Sequence[Any],
     ) -> str:
+        import tabulate
+
         if computation.selection_range is None:
             raise TypeError("selection range is None")
-        if (
-            not self.output_rational
-            and computation.computation_type == ComputationType.PROBABILITY
+        rows = [
+            (size, *self.format_value(computation, value))
+            for size, value in zip(computation.selection_range, evaluation, strict=True)
+        ]
+        headers = [computation.x_label(), *self.value_headers(computation)]
+        return tabulate.tabulate(rows, headers=headers)
+
+    def make_sweep_table(
+        self,
+        computation: ComputationDescription,
+        evaluation: Sequence[Any],
+    ) -> str:
+        """Table with a row for each point of the sweep and a column for
+        each selection size. Error bounds and confidence intervals are
+        shown in the same cell as their value.
+        """
+        import tabulate
+
+        if computation.selection_range is None:
+            raise TypeError("selection range is None")
+        rows = [
+            [
+                *point.values(),
+                *(
+                    None if value is None else self.format_cell(computation, value)
+                    for value in values
+                ),
+            ]
+            for point, values in zip(*self.sweep_grid(computation, evaluation))
+        ]
+        headers = [
+            *computation.sweep,
+            *(f"{computation.x_label()} {size}" for size in computation.selection_range),
+        ]
+        return tabulate.tabulate(rows, headers=headers)
+
+    def make_csv(
+        self,
+        computation: ComputationDescription,
+        evaluation: Sequence[Any],
+    ) -> str:
+        """Comma separated values with a row for each selection size (and
+        each point of the sweep) and a column for each of `record_fields`.
+        """
+        buffer = io.StringIO()
+        self.write_csv(computation, evaluation, buffer)
+        return buffer.getvalue().rstrip("\n")
+
+    def write_csv(
+        self,
+        computation: ComputationDescription,
+        evaluation: Sequence[Any],
+        file: IO[str],
+    ) -> None:
+        """Write the rows of `make_csv` to the file one at a time."""
+        writer = csv.writer(file, lineterminator="\n")
+        writer.writerow(self.record_fields(computation))
+        writer.writerows(self.records(computation, evaluation))
+
+    def make_json(
+        self,
+        computation: ComputationDescription,
+        evaluation: Sequence[Any],
+    ) -> str:
+        """JSON Lines: an object for each selection size (and each point of
+        the sweep) with the fields of `record_fields`.
+        """
+        buffer = io.StringIO()
+        self.write_json(computation, evaluation, buffer)
+        return buffer.getvalue().rstrip("\n")
+
+    def write_json(
+        self,
+        computation: ComputationDescription,
+        evaluation: Sequence[Any],
+        file: IO[str],
+    ) -> None:
+        """Write the lines of `make_json` to the file one at a time."""
+        fields = self.record_fields(computation)
+        for record in self.records(computation, evaluation):
+            file.write(json.dumps(dict(zip(fields, record, strict=True))) + "\n")
+
+    def write_arrow(
+        self,
+        computation: ComputationDescription,
+        evaluation: Sequence[Any],
+        file: IO[bytes],
+    ) -> None:
+        """Write the records as an Arrow IPC stream, in batches of up to
+        `ARROW_BATCH_ROWS` rows.
+
+        Counts, numerators and denominators are 64-bit integer columns if
+        every possible value fits, and decimal strings otherwise.
+        """
+        try:
+            import pyarrow as pa
+        except ImportError as error:
+            raise ComputationDescriptionError(
+                "Arrow output requires pyarrow to be installed."
+            ) from error
+
+        exact = pa.int64() if fits_int64(computation) else pa.string()
+        fields = self.record_fields(computation)
+        n_keys = len(computation.sweep) + 1
+        if computation.computation_type == ComputationType.ESTIMATE or (
+            computation.approximate
         ):
-            values = map(float, evaluation)
+            value_type = pa.float64()
+        elif computation.computation_type == ComputationType.PROBABILITY:
+            value_type = exact if self.output_rational else pa.float64()
         else:
-            values = evaluation
-        rows = list(
-            zip(
-                computation.selection_range,
-                map(str, values),
-                strict=True,
-            )
-        )
-        headers = [computation.x_label(), computation.y_label()]
-        return tabulate.tabulate(rows, headers=headers)
+            value_type = exact
+        types = [pa.int64()] * n_keys + [value_type] * (len(fields) - n_keys)
+        schema = pa.schema(list(zip(fields, types, strict=True)))
+
+        records = self.records(computation, evaluation)
+        with pa.ipc.new_stream(file, schema) as writer:
+            while rows := list(itertools.islice(records, ARROW_BATCH_ROWS)):
+                columns = [list(column) for column in zip(*rows, strict=True)]
+                if value_type == pa.string():
+                    for column in columns[n_keys:]:
+                        column[:] = map(str, column)
+                writer.write_batch(
+                    pa.record_batch(
+                        [
+                            pa.array(column, type=type_)
+                            for column, type_ in zip(columns, types, strict=True)
+                        ],
+                        schema=schema,
+                    )
+                )
+
+    def write(
+        self,
+        computation: ComputationDescription,
+        evaluation: Sequence[Any],
+        file: IO[bytes],
+    ) -> None:
+        """Write the output to the binary file, a row at a time for CSV,
+        JSON Lines and Arrow. Text is encoded as UTF-8 and ends with a
+        newline.
+        """
+        if self.output_fmt == OutputFormat.ARROW:
+            self.write_arrow(computation, evaluation, file)
+        elif self.output_fmt in (OutputFormat.CSV, OutputFormat.JSON):
+            text = io.TextIOWrapper(file, encoding="utf-8", newline="")
+            try:
+                if self.output_fmt == OutputFormat.CSV:
+                    self.write_csv(computation, evaluation, text)
+                else:
+                    self.write_json(computation, evaluation, text)
+            finally:
+                text.detach()
+        else:
+            file.write(f"{self.output(computation, evaluation)}\n".encode())
+
+    def make_heatmap(
+        self,
+        computation: ComputationDescription,
+        evaluation: Sequence[Any],
+    ) -> str:
+        """Shade a cell for each selection size (columns) at each point of
+        the sweep (rows) by its value, relative to the largest value.
+        """
+        if computation.selection_range is None:
+            raise TypeError("selection range is None")
+        points, grid = self.sweep_grid(computation, evaluation)
+        sizes = [str(size) for size in computation.selection_range]
+        values = [
+            [math.nan if value is None else float(value) for value in row]
+            for row in grid
+        ]
+        top = max((v for row in values for v in row if math.isfinite(v)), default=0.0)
+        width = max([2, *map(len, sizes)])
+        labels = [
+            ", ".join(f"{name}={count}" for name, count in point.items())
+            for point in points
+        ]
+        label_width = max(map(len, labels))
+
+        def shade(value: float) -> str:
+            if not math.isfinite(value):
+                return " " * width
+            level = round(value / top * (len(HEATMAP_SHADES) - 1)) if top > 0 else 0
+            return HEATMAP_SHADES[level] * width
+
+        lines = [
+            " " * label_width + " " + " ".join(size.rjust(width) for size in sizes),
+            *(
+                label.rjust(label_width) + " " + " ".join(map(shade, row))
+                for label, row in zip(labels, values, strict=True)
+            ),
+            "",
+            (
+                f"{computation.x_label()} (columns), "
+                f"{computation.y_label()} from 0 ({HEATMAP_SHADES[0]!r}) "
+                f"to {top:g} ({HEATMAP_SHADES[-1]!r})"
+            ),
+        ]
+        return "\n".join(line.rstrip() for line in lines)
 
     def make_plot(
         self,
         computation: ComputationDescription,
-        evaluation: Sequence[Rational | int],
+        evaluation: Sequence[Any],
     ) -> str:
+        import uniplot
+
+        if computation.sweep:
+            return self.make_sweep_plot(computation, evaluation)
         if computation.selection_range is None:
             raise TypeError("selection range is None")
         if len(computation.selection_range) != len(evaluation):
             raise ValueError(
                 "Evaluation sequence must be same length as selection range."
             )
+        if computation.computation_type == ComputationType.ESTIMATE:
+            # Plot confidence interval bounds around the estimates
+            xs = list(computation.selection_range)
+            plt = uniplot.plot_to_string(
+                ys=[
+                    [value.low for value in evaluation],
+                    list(map(float, evaluation)),
+                    [value.high for value in evaluation],
+                ],
+                xs=[xs, xs, xs],
+                y_min=0,
+                legend_labels=["95% CI low", "estimate", "95% CI high"],
+            )
+            return join_plot_lines(plt)
         plt = uniplot.plot_to_string(
-            ys=evaluation,
+            ys=list(map(float, evaluation)),
             xs=computation.selection_range,
             y_min=0,
         )
-        return "\n".join(plt)
+        return join_plot_lines(plt)
+
+    def make_sweep_plot(
+        self,
+        computation: ComputationDescription,
+        evaluation: Sequence[Any],
+    ) -> str:
+        """Plot a line for each selection size against the swept count."""
+        import uniplot
+
+        if computation.selection_range is None:
+            raise TypeError("selection range is None")
+        if len(computation.sweep) != 1:
+            raise ComputationDescriptionError(
+                "Can only plot a sweep over the count of one item."
+            )
+        (name, counts), = computation.sweep.items()
+        xs, ys, labels = [], [], []
+        for column, size in enumerate(computation.selection_range):
+            pairs = [
+                (count, float(values[column]))
+                for count, values in zip(counts, evaluation, strict=True)
+                if values[column] is not None
+            ]
+            if pairs:
+                xs.append([count for count, _ in pairs])
+                ys.append([value for _, value in pairs])
+                labels.append(f"{computation.x_label()} {size}")
+        plt = uniplot.plot_to_string(
+            ys=ys, xs=xs, y_min=0, title=f"{computation.y_label()} by {name}",
+            legend_labels=labels,
+        )
+        return join_plot_lines(plt)
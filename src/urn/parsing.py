@@ -1,3 +1,5 @@
+from collections.abc import Iterable, Iterator
+
 import lark
 
 from urn.constraint import ConstraintItem
@@ -6,20 +8,78 @@ from urn.computation import ComputationDescription
 from urn.constants import OutputFormat, ComputationType, ComputationAction
 
 
+EOL = ";"
+
+
+def split_queries(lines: Iterable[str]) -> Iterator[str]:
+    """Yield each query terminated by EOL from lines of text.
+
+    Queries are yielded as soon as their terminator is read. Any text
+    left after the last terminator is yielded as a final query (so that
+    the parser reports it as incomplete).
+    """
+    buffer: list[str] = []
+    for line in lines:
+        while (end := line.find(EOL)) != -1:
+            buffer.append(line[:end+1])
+            yield "".join(buffer)
+            buffer = []
+            line = line[end+1:]
+        buffer.append(line)
+    if (rest := "".join(buffer)).strip():
+        yield rest
+
+
+def make_parser() -> lark.Lark:
+    """Make parser for queries.
+
+    The LALR parser tables are cached on disk by lark, so they are only
+    built on the first run after the grammar changes.
+    """
+    return lark.Lark.open("grammar.lark", rel_to=__file__, parser="lalr", cache=True)
+
+
 @lark.v_args(inline=True)
 class BuildComputation(lark.Transformer):
-    """Build ComputationDescription and Output classes from a syntax tree."""
+    """Build ComputationDescription and Output classes from a syntax tree.
+
+    A query may refer to a collection by name (see `urn.session`), which
+    is then left in `named_collection`. A query defining a named collection
+    sets `defined_collection` to the name. A query prefixed by `EXPLAIN`
+    sets `explain_plan`.
+    """
     def __init__(self):
         super().__init__()
         self.computation = ComputationDescription()
         self.output = Output()
+        self.named_collection: str | None = None
+        self.defined_collection: str | None = None
+        self.explain_plan = False
 
     def start(self):
         return self
 
     @lark.v_args(tree=True)
     def collection(self, tree):
-        self.computation.collection = dict(tree.children)
+        items = dict(tree.children)
+        self.computation.collection = {
+            name: count for name, count in items.items() if isinstance(count, int)
+        }
+        self.computation.sweep = {
+            name: counts for name, counts in items.items() if isinstance(counts, range)
+        }
+        return lark.Discard
+
+    def collection_name(self, name):
+        self.named_collection = name
+        return lark.Discard
+
+    def definition(self, name):
+        self.defined_collection = name
+        return lark.Discard
+
+    def explain(self):
+        self.explain_plan = True
         return lark.Discard
 
     @lark.v_args(tree=True)
@@ -41,6 +101,9 @@ class BuildComputation(lark.Transformer):
 
     def collection_item(self, name, number):
         return name, number
+
+    def collection_item_sweep(self, name, low, high):
+        return name, range(low, high+1)
     
     @lark.v_args(tree=True)
     def count_draw(self, _):
@@ -54,6 +117,17 @@ class BuildComputation(lark.Transformer):
         self.computation.computation_action = ComputationAction.DRAW
         return lark.Discard
     
+    @lark.v_args(tree=True)
+    def estimate_draw(self, _):
+        self.computation.computation_type = ComputationType.ESTIMATE
+        self.computation.computation_action = ComputationAction.DRAW
+        return lark.Discard
+
+    def samples(self, samples, seed=None):
+        self.computation.samples = samples
+        self.computation.seed = seed
+        return lark.Discard
+
     @lark.v_args(tree=True)
     def and_constraints(self, tree):
         return tree.children
@@ -86,18 +160,24 @@ class BuildComputation(lark.Transformer):
         return ConstraintItem(name, min_=number_lo, max_=number_hi+1)
 
     def output_fmt(self, output):
-        if str(output).upper() == "PLOT":
-            self.output.output_fmt = OutputFormat.PLOT
-        elif str(output).upper() == "TABLE":
-            self.output.output_fmt = OutputFormat.TABLE
-        else:
-            raise ValueError(f"Unknown output format '{output}'")
+        try:
+            self.output.output_fmt = OutputFormat[str(output).upper()]
+        except KeyError:
+            raise ValueError(f"Unknown output format '{output}'") from None
         return lark.Discard
 
     def output_rational(self, _):
         self.output.output_rational = True
         return lark.Discard
 
+    def output_approximate(self, *_):
+        self.computation.approximate = True
+        return lark.Discard
+
+    def output_timing(self, _):
+        self.output.show_timing = True
+        return lark.Discard
+
     def NUMBER(self, token):
         return int(token)
 
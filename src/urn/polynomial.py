@@ -0,0 +1,386 @@
+"""Truncated polynomial arithmetic over the integers.
+
+Each backend stores polynomials in its own representation and exposes
+the same small set of operations. Coefficients go in and come out as
+sequences of Python ints, lowest degree first:
+
+    [1, 5, 10] -> 10*x**2 + 5*x + 1
+
+Multiplication accepts an exclusive degree bound so that terms which
+can never contribute to the result are discarded as soon as possible.
+"""
+import functools
+import math
+from collections.abc import Iterable, Sequence
+from itertools import repeat
+from operator import add, mul
+from typing import Any
+
+from urn.profiling import counted
+
+
+class BackendError(Exception):
+    pass
+
+
+class PolynomialBackend:
+    """Base class for polynomial backends."""
+
+    name: str
+
+    def from_coeffs(self, coeffs: Sequence[Any]) -> Any:
+        raise NotImplementedError
+
+    def to_coeffs(self, poly: Any) -> list[Any]:
+        raise NotImplementedError
+
+    def binomial(self, n: int, k: int) -> Any:
+        raise NotImplementedError
+
+    def mul(self, a: Any, b: Any, bound: int | None = None) -> Any:
+        """Multiply polynomials, discarding terms of degree >= `bound`."""
+        raise NotImplementedError
+
+    def divexact(self, poly: Any, n: int) -> Any:
+        """Divide each coefficient by `n`, which must divide it exactly."""
+        raise NotImplementedError
+
+    def measure(self, poly: Any) -> tuple[int, int]:
+        """Degree and largest coefficient bit-length of the polynomial."""
+        coeffs = self.to_coeffs(poly)
+        bits = max((abs(int(coeff)).bit_length() for coeff in coeffs), default=0)
+        return len(coeffs) - 1, bits
+
+    def product(self, polys: Iterable[Any], bound: int | None = None) -> Any:
+        """Multiply polynomials, discarding terms of degree >= `bound`.
+
+        Polynomials are multiplied in pairs, then the products in pairs,
+        and so on, so that operands of each multiplication have similar
+        degrees.
+        """
+        polys = list(polys)
+        if not polys:
+            return self.from_coeffs([1])
+        while len(polys) > 1:
+            pairs = [polys[i:i+2] for i in range(0, len(polys), 2)]
+            polys = [
+                self.mul(pair[0], pair[1], bound) if len(pair) == 2 else pair[0]
+                for pair in pairs
+            ]
+        return polys[0]
+
+    def coefficient(self, polys: Iterable[Any], degree: int) -> Any:
+        """Return the coefficient of x**degree in the product of polynomials.
+
+        Each half of the polynomials is multiplied without terms above
+        `degree`, and only the wanted coefficient of the product of the
+        two halves is computed.
+        """
+        polys = list(polys)
+        half = len(polys) // 2
+        a = self.to_coeffs(self.product(polys[:half], bound=degree + 1))
+        b = self.to_coeffs(self.product(polys[half:], bound=degree + 1))
+        return sum(
+            a[i] * b[degree - i]
+            for i in range(max(0, degree - len(b) + 1), min(len(a), degree + 1))
+        )
+
+    def power(self, poly: Any, k: int, bound: int | None = None) -> Any:
+        """Raise polynomial to the power `k` by repeated squaring,
+        discarding terms of degree >= `bound`.
+        """
+        result = self.from_coeffs([1])
+        while k:
+            if k & 1:
+                result = self.mul(result, poly, bound)
+            k >>= 1
+            if k:
+                poly = self.mul(poly, poly, bound)
+        return result
+
+
+def pack_coeffs(coeffs: Sequence[int], width: int) -> int:
+    """Pack non-negative coefficients into one integer, `width` bytes each."""
+    return int.from_bytes(
+        b"".join(coeff.to_bytes(width, "little") for coeff in coeffs), "little"
+    )
+
+
+def unpack_coeffs(packed: int, width: int, size: int) -> list[int]:
+    """Unpack the lowest `size` coefficients of `width` bytes each."""
+    packed &= (1 << (8 * width * size)) - 1
+    data = packed.to_bytes(width * size, "little")
+    return [
+        int.from_bytes(data[i:i+width], "little") for i in range(0, len(data), width)
+    ]
+
+
+def kronecker_bits(a: Sequence[Any], b: Sequence[Any]) -> int:
+    """Bits needed to hold each coefficient of the product of a and b."""
+    return (
+        int(max(a)).bit_length()
+        + int(max(b)).bit_length()
+        + min(len(a), len(b)).bit_length()
+    )
+
+
+class PythonBackend(PolynomialBackend):
+    """Polynomials as lists of Python ints.
+
+    The arithmetic only relies on `+` and `*` of the coefficients, so
+    lists of other numeric types (e.g. `Fraction`) are also supported.
+
+    Long polynomials with non-negative int coefficients are multiplied
+    by Kronecker substitution: the coefficients of each are packed into
+    one large integer, wide enough that the coefficients of the product
+    do not overlap, and the product of the integers is unpacked.
+    """
+
+    name = "python"
+
+    # Kronecker substitution is used if the shorter operand has at least
+    # `kronecker_threshold` terms and each packed coefficient needs at most
+    # `kronecker_max_bits` bits (None for no limit). Chosen by benchmark:
+    # CPython multiplies large integers by Karatsuba, which is only faster
+    # than the schoolbook method for narrow coefficients.
+    kronecker_threshold = 16
+    kronecker_max_bits: int | None = 256
+
+    def from_coeffs(self, coeffs: Sequence[Any]) -> list[Any]:
+        return list(coeffs)
+
+    def to_coeffs(self, poly: list[Any]) -> list[Any]:
+        return list(poly)
+
+    def binomial(self, n: int, k: int) -> Any:
+        return math.comb(n, k)
+
+    @counted
+    def mul(self, a: list[Any], b: list[Any], bound: int | None = None) -> list[Any]:
+        """Multiply polynomials, discarding terms of degree >= `bound`."""
+        if not a or not b:
+            return []
+        size = len(a) + len(b) - 1
+        if bound is not None:
+            size = min(size, bound)
+        if len(a) > len(b):
+            a, b = b, a
+        if len(a) >= self.kronecker_threshold and self.is_packable(a, b):
+            bits = kronecker_bits(a[:size], b[:size])
+            if self.kronecker_max_bits is None or bits <= self.kronecker_max_bits:
+                return self.kronecker_mul(a[:size], b[:size], size, bits)
+        out = [0] * size
+        for i, coeff in enumerate(a[:size]):
+            if not coeff:
+                continue
+            stop = min(len(b), size - i)
+            out[i:i+stop] = map(add, out[i:i+stop], map(mul, b[:stop], repeat(coeff)))
+        return out
+
+    def divexact(self, poly: list[Any], n: int) -> list[Any]:
+        """Divide each coefficient by `n`, which must divide it exactly."""
+        return [coeff // n for coeff in poly]
+
+    def is_packable(self, *polys: list[Any]) -> bool:
+        """True if the coefficients can be multiplied by `kronecker_mul`."""
+        return all(
+            all(type(coeff) is int for coeff in poly) and min(poly) >= 0
+            for poly in polys
+        )
+
+    def kronecker_mul(
+        self, a: list[Any], b: list[Any], size: int, bits: int
+    ) -> list[Any]:
+        """Multiply by Kronecker substitution, keeping `size` coefficients
+        of `bits` bits each.
+        """
+        width = (bits + 7) // 8
+        product = pack_coeffs(a, width) * pack_coeffs(b, width)
+        return unpack_coeffs(product, width, size)
+
+
+class Gmpy2Backend(PythonBackend):
+    """Polynomials as lists of gmpy2 `mpz` integers.
+
+    GMP multiplies large integers by FFT, so Kronecker substitution (see
+    `PythonBackend`) is faster for all but the shortest polynomials, no
+    matter how wide the coefficients are.
+    """
+
+    name = "gmpy2"
+
+    kronecker_threshold = 4
+    kronecker_max_bits = None
+
+    def __init__(self) -> None:
+        try:
+            import gmpy2
+        except ImportError as error:
+            raise BackendError(
+                "Backend 'gmpy2' requires gmpy2 to be installed."
+            ) from error
+        self._gmpy2: Any = gmpy2
+
+    def from_coeffs(self, coeffs: Sequence[Any]) -> list[Any]:
+        return list(map(self._gmpy2.mpz, coeffs))
+
+    def to_coeffs(self, poly: list[Any]) -> list[int]:
+        return list(map(int, poly))
+
+    def binomial(self, n: int, k: int) -> Any:
+        return self._gmpy2.comb(n, k)
+
+    def is_packable(self, *polys: list[Any]) -> bool:
+        return all(min(poly) >= 0 for poly in polys)
+
+    def kronecker_mul(
+        self, a: list[Any], b: list[Any], size: int, bits: int
+    ) -> list[Any]:
+        """Multiply by Kronecker substitution, keeping `size` coefficients
+        of `bits` bits each.
+        """
+        product = self._gmpy2.pack(a, bits) * self._gmpy2.pack(b, bits)
+        out = self._gmpy2.unpack(product, bits)[:size]
+        return out + [self._gmpy2.mpz(0)] * (size - len(out))
+
+
+class FlintBackend(PolynomialBackend):
+    """Polynomials as python-flint `fmpz_poly` objects."""
+
+    name = "flint"
+
+    def __init__(self) -> None:
+        try:
+            import flint
+        except ImportError as error:
+            raise BackendError(
+                "Backend 'flint' requires python-flint to be installed."
+            ) from error
+        self._flint = flint
+
+    def from_coeffs(self, coeffs: Sequence[int]) -> Any:
+        return self._flint.fmpz_poly(list(coeffs))
+
+    def to_coeffs(self, poly: Any) -> list[int]:
+        return list(map(int, poly.coeffs()))
+
+    def binomial(self, n: int, k: int) -> Any:
+        return self._flint.fmpz.bin_uiui(n, k)
+
+    @counted
+    def mul(self, a: Any, b: Any, bound: int | None = None) -> Any:
+        """Multiply polynomials, discarding terms of degree >= `bound`."""
+        if bound is None:
+            return a * b
+        return a.mul_low(b, bound)
+
+    @counted
+    def power(self, poly: Any, k: int, bound: int | None = None) -> Any:
+        """Raise polynomial to the power `k`, discarding terms of degree >= `bound`.
+
+        Counted as a single multiplication when profiling.
+        """
+        if bound is None:
+            return poly ** k
+        return poly.pow_trunc(k, bound)
+
+    def divexact(self, poly: Any, n: int) -> Any:
+        """Divide each coefficient by `n`, which must divide it exactly."""
+        return poly / n
+
+    def measure(self, poly: Any) -> tuple[int, int]:
+        return poly.degree(), poly.height_bits()
+
+
+class ExponentialBackend(PolynomialBackend):
+    """Exponential generating functions with integer coefficients, using
+    another backend for the arithmetic.
+
+    The series sum(c[k] * x**k / k!) is stored as the integer polynomial
+    with coefficients c[k] * m! / k!, where m = bound - 1 is the highest
+    degree kept. The product of two such polynomials is the stored form
+    of the product of the series times m!, so it is divided by m! exactly
+    and no rational arithmetic is needed. Coefficients go in and come out
+    as the integers c[k] (e.g. numbers of sequences of draws).
+    """
+
+    def __init__(self, base: PolynomialBackend, bound: int) -> None:
+        self.base = base
+        self.bound = bound
+        self.name = f"{base.name} (exponential)"
+        self._factorials = [1]
+        for k in range(1, bound):
+            self._factorials.append(self._factorials[-1] * k)
+        self._scale = self._factorials[-1]
+        # Stored coefficient of degree k is c[k] times m! / k!
+        self._cofactors = [1] * bound
+        for k in range(bound - 2, -1, -1):
+            self._cofactors[k] = self._cofactors[k + 1] * (k + 1)
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, ExponentialBackend)
+            and self.base is other.base
+            and self.bound == other.bound
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.base.name, self.bound))
+
+    def from_coeffs(self, coeffs: Sequence[int]) -> Any:
+        return self.base.from_coeffs(
+            list(map(mul, coeffs[:self.bound], self._cofactors))
+        )
+
+    def to_coeffs(self, poly: Any) -> list[int]:
+        return [
+            int(coeff) * self._factorials[k] // self._scale
+            for k, coeff in enumerate(self.base.to_coeffs(poly))
+        ]
+
+    def binomial(self, n: int, k: int) -> Any:
+        return self.base.binomial(n, k)
+
+    def mul(self, a: Any, b: Any, bound: int | None = None) -> Any:
+        """Multiply series, discarding terms of degree >= `bound`."""
+        bound = self.bound if bound is None else min(bound, self.bound)
+        return self.base.divexact(self.base.mul(a, b, bound), self._scale)
+
+    def coefficient(self, polys: Iterable[Any], degree: int) -> Any:
+        """Return the coefficient of x**degree in the product of series."""
+        polys = list(polys)
+        half = len(polys) // 2
+        a = self.base.to_coeffs(self.product(polys[:half], bound=degree + 1))
+        b = self.base.to_coeffs(self.product(polys[half:], bound=degree + 1))
+        total = sum(
+            int(a[i]) * int(b[degree - i])
+            for i in range(max(0, degree - len(b) + 1), min(len(a), degree + 1))
+        )
+        return total * self._factorials[degree] // self._scale ** 2
+
+
+BACKENDS: dict[str, type[PolynomialBackend]] = {
+    "python": PythonBackend,
+    "gmpy2": Gmpy2Backend,
+    "flint": FlintBackend,
+}
+
+# Order in which backends are tried when the backend is "auto".
+AUTO_PREFERENCE = ["flint", "gmpy2", "python"]
+
+
+@functools.cache
+def get_backend(name: str | None = None) -> PolynomialBackend:
+    """Return polynomial backend with the given name.
+
+    If name is None or "auto", return the fastest installed backend.
+    """
+    if name is None or name == "auto":
+        for candidate in AUTO_PREFERENCE:
+            try:
+                return get_backend(candidate)
+            except BackendError:
+                continue
+    if name not in BACKENDS:
+        raise BackendError(f"Unknown backend '{name}'")
+    return BACKENDS[name]()
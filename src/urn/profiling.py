@@ -0,0 +1,170 @@
+"""Wall time spent in each phase of a query and counts of the work done.
+
+Instrumented code records into the active profile, if there is one, so
+the cost is negligible when nothing is being profiled:
+
+    >>> with profiling() as profile:
+    ...     counts = count({"red": 5, "blue": 3}, {"red": 2})
+    >>> profile.as_dict()["terms"]
+    1
+
+The phases are `parse`, `finalise`, `evaluate` and `format`. Building
+item polynomials (`factors`) and multiplying them out (`products`) are
+timed separately, and are part of `evaluate`.
+
+Factors and term products served from a cache are not built again, so
+they are counted as `cached_factors` and `cached_products` rather than
+as multiplications: the same query usually does fewer multiplications
+the second time it is evaluated in a process.
+"""
+import contextlib
+import dataclasses
+import functools
+import time
+from collections.abc import Callable, Iterator
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+# Order of phases in the report (any others are listed after these)
+PHASES = ["parse", "finalise", "evaluate", "factors", "products", "format"]
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@dataclass
+class Profile:
+    """Wall time of each phase (in seconds) and counts of the work done.
+
+    `terms` is the number of disjoint boxes or inclusion-exclusion terms
+    evaluated, `multiplications` the number of polynomial multiplications,
+    and `max_degree` and `max_bits` the largest degree and coefficient
+    bit-length of any product. `cached_factors` and `cached_products`
+    count the item factors and term products reused from a cache, whose
+    multiplications are not counted again.
+    """
+
+    phases: dict[str, float] = field(default_factory=dict)
+    terms: int = 0
+    multiplications: int = 0
+    max_degree: int = 0
+    max_bits: int = 0
+    cached_factors: int = 0
+    cached_products: int = 0
+
+    def add_time(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Add the wall time spent in the block to the phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def record_product(self, degree: int, bits: int) -> None:
+        """Count a multiplication whose product has the degree and
+        coefficient bit-length.
+        """
+        self.multiplications += 1
+        self.max_degree = max(self.max_degree, degree)
+        self.max_bits = max(self.max_bits, bits)
+
+    def merge(self, other: "Profile") -> None:
+        """Add the counts of another profile (e.g. from a worker process).
+
+        Phase times are not added, as they overlap with the phases here.
+        """
+        self.terms += other.terms
+        self.multiplications += other.multiplications
+        self.max_degree = max(self.max_degree, other.max_degree)
+        self.max_bits = max(self.max_bits, other.max_bits)
+        self.cached_factors += other.cached_factors
+        self.cached_products += other.cached_products
+
+    def as_dict(self) -> dict[str, Any]:
+        return dataclasses.asdict(self)
+
+    def report(self) -> str:
+        import tabulate
+
+        order = [name for name in PHASES if name in self.phases]
+        order += [name for name in self.phases if name not in PHASES]
+        phases = tabulate.tabulate(
+            [(name, f"{self.phases[name]:.6f}") for name in order],
+            headers=["phase", "seconds"],
+            disable_numparse=True,
+        )
+        counts = tabulate.tabulate(
+            [
+                ("terms", self.terms),
+                ("multiplications", self.multiplications),
+                ("max degree", self.max_degree),
+                ("max bits", self.max_bits),
+                ("cached factors", self.cached_factors),
+                ("cached products", self.cached_products),
+            ],
+            headers=["counter", "value"],
+        )
+        return f"{phases}\n\n{counts}"
+
+
+_active_profile: ContextVar[Profile | None] = ContextVar(
+    "active_profile", default=None
+)
+
+
+def active_profile() -> Profile | None:
+    """The profile that instrumented code records into, if any."""
+    return _active_profile.get()
+
+
+@contextlib.contextmanager
+def profiling(profile: Profile | None = None) -> Iterator[Profile]:
+    """Record into the profile (a new one if not given) within the block."""
+    profile = Profile() if profile is None else profile
+    token = _active_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _active_profile.reset(token)
+
+
+def phase(name: str) -> contextlib.AbstractContextManager:
+    """Time the block as the phase of the active profile, if any."""
+    profile = _active_profile.get()
+    if profile is None:
+        return contextlib.nullcontext()
+    return profile.phase(name)
+
+
+def count_terms(n: int = 1) -> None:
+    """Count terms evaluated in the active profile, if any."""
+    if (profile := _active_profile.get()) is not None:
+        profile.terms += n
+
+
+def count_cached(factors: int = 0, products: int = 0) -> None:
+    """Count factors and term products reused from a cache in the active
+    profile, if any.
+    """
+    if (profile := _active_profile.get()) is not None:
+        profile.cached_factors += factors
+        profile.cached_products += products
+
+
+def counted(method: F) -> F:
+    """Decorate a backend multiplication method to record each product
+    in the active profile (measured by the backend's `measure` method).
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        if (profile := _active_profile.get()) is not None:
+            profile.record_product(*self.measure(result))
+        return result
+
+    return wrapper  # type: ignore
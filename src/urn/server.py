@@ -0,0 +1,281 @@
+"""Local query server (`urn serve`).
+
+Keeps a pool of worker processes, each with its parser built, so that
+other programs can evaluate queries without paying for startup on every
+call. Requests are HTTP over a local TCP port or a Unix socket:
+
+    POST /query    {"query": "COUNT DRAW 2 FROM a=4, b=5;"}
+                   -> {"result": "...", "error": null}
+    GET  /metrics  -> queue depth, request counts and latencies
+
+Identical queries that arrive while one of them is being evaluated share
+that evaluation. If the server is started with `--profile`, each result
+also has the report of its profile.
+"""
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import signal
+import statistics
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+from urn.cli import QueryResult, _evaluate_query_in_worker, _init_worker
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Number of recent request latencies kept for the metrics
+LATENCY_WINDOW = 1000
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 2 ** 20
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    422: "Unprocessable Entity",
+    500: "Internal Server Error",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class WorkerError(Exception):
+    pass
+
+
+def _init_server_worker() -> None:
+    # Leave Ctrl+C to the server, which shuts the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _init_worker()
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile `q` (from 0 to 100) of the sorted values."""
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+class QueryServer:
+    """Evaluate queries in a pool of `jobs` worker processes, sharing
+    the evaluation of identical queries that are in flight at once.
+
+    The `options` are passed to `process_query` for each query.
+    """
+
+    def __init__(self, jobs: int = 1, **options: Any) -> None:
+        self.jobs = jobs
+        self.options = options
+        self.requests = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._pending: dict[str, asyncio.Future[QueryResult]] = {}
+        self._executor: ProcessPoolExecutor | None = None
+
+    def start(self) -> None:
+        """Start the worker processes.
+
+        Workers are started by "spawn" rather than "fork", so that they
+        never inherit the socket of a client connection (which would stay
+        open until the worker exits). They are started now, rather than
+        when the first query arrives, so that it does not wait for them.
+        """
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.jobs,
+            initializer=_init_server_worker,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        wait([self._executor.submit(os.getpid) for _ in range(self.jobs)])
+
+    def restart(self) -> None:
+        """Replace the pool of workers (e.g. after one of them died)."""
+        self.close()
+        self.start()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def evaluate(self, query: str) -> QueryResult:
+        """Evaluate query in a worker process, or wait for the evaluation
+        of an identical query (ignoring spacing) if one is in flight.
+        """
+        if self._executor is None:
+            raise RuntimeError("Server must be started before evaluating queries.")
+        start = time.perf_counter()
+        self.requests += 1
+        key = " ".join(query.split())
+        if key in self._pending:
+            self.coalesced += 1
+            future = self._pending[key]
+        else:
+            future = self._submit(query)
+            self._pending[key] = future
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+        executor = self._executor
+        try:
+            result = await asyncio.shield(future)
+        except BrokenProcessPool:
+            self.errors += 1
+            if self._executor is executor:
+                self.restart()
+            raise WorkerError("A worker process stopped unexpectedly.") from None
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+        if result[1] is not None:
+            self.errors += 1
+        return result
+
+    def _submit(self, query: str) -> asyncio.Future[QueryResult]:
+        assert self._executor is not None
+        loop = asyncio.get_running_loop()
+        try:
+            return loop.run_in_executor(
+                self._executor, _evaluate_query_in_worker, query, self.options
+            )
+        except BrokenProcessPool:
+            # A worker died since the last query: replace the pool and retry
+            self.restart()
+            return loop.run_in_executor(
+                self._executor, _evaluate_query_in_worker, query, self.options
+            )
+
+    def metrics(self) -> dict[str, Any]:
+        """Queue depth, request counts and latencies (in seconds) of the
+        most recent requests.
+        """
+        latencies = sorted(self.latencies)
+        if latencies:
+            latency = {
+                "mean": statistics.fmean(latencies),
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "max": latencies[-1],
+            }
+        else:
+            latency = {"mean": None, "p50": None, "p95": None, "max": None}
+        return {
+            "queue_depth": len(self._pending),
+            "workers": self.jobs,
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "latency": latency,
+        }
+
+    async def respond(self, method: str, path: str, body: bytes) -> tuple[int, Any]:
+        """Return the status and JSON content of the response to a request."""
+        if path == "/metrics":
+            if method != "GET":
+                raise HttpError(405, "Use GET for /metrics.")
+            return 200, self.metrics()
+        if path == "/query":
+            if method != "POST":
+                raise HttpError(405, "Use POST for /query.")
+            try:
+                request = json.loads(body)
+            except ValueError:
+                raise HttpError(400, "Request body must be JSON.") from None
+            if not isinstance(request, dict) or not isinstance(
+                request.get("query"), str
+            ):
+                raise HttpError(400, "Request must have a 'query' string.")
+            try:
+                result, error, report = await self.evaluate(request["query"])
+            except WorkerError as error:
+                raise HttpError(500, str(error)) from None
+            content = {"result": result, "error": error}
+            if report is not None:
+                content["profile"] = report
+            return (422 if error else 200), content
+        raise HttpError(404, f"No such path: {path}")
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Read one HTTP request from the connection and write the response."""
+        try:
+            method, path, body = await read_request(reader)
+            status, content = await self.respond(method, path, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            return
+        except HttpError as error:
+            status, content = error.status, {"result": None, "error": str(error)}
+        try:
+            writer.write(encode_response(status, content))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def read_request(reader: asyncio.StreamReader) -> tuple[str, str, bytes]:
+    """Read the method, path and body of an HTTP request."""
+    request_line = (await reader.readline()).decode("latin-1").split()
+    if len(request_line) != 3:
+        raise HttpError(400, "Malformed request line.")
+    method, path, _ = request_line
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            try:
+                length = int(value)
+            except ValueError:
+                raise HttpError(400, "Invalid Content-Length.") from None
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "Request body is too large.")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path.split("?", 1)[0], body
+
+
+def encode_response(status: int, content: Any) -> bytes:
+    body = json.dumps(content).encode()
+    head = (
+        f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+async def serve(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    socket_path: str | None = None,
+    jobs: int = 1,
+    **options: Any,
+) -> None:
+    """Serve queries on the host and port (or Unix socket) until cancelled."""
+    server = QueryServer(jobs=jobs, **options)
+    server.start()
+    try:
+        if socket_path is not None:
+            listener = await asyncio.start_unix_server(
+                server.handle_connection, path=socket_path
+            )
+        else:
+            listener = await asyncio.start_server(
+                server.handle_connection, host=host, port=port
+            )
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
@@ -0,0 +1,84 @@
+"""State kept between the queries of a session.
+
+Collections defined with `LET name = ...;` can be referred to by name
+(`FROM name`) in later queries. The products of the factors of each term
+are kept in memory, so a query that shares terms with an earlier one (for
+instance the same deck with one more constraint) only multiplies out the
+terms that differ. Item factors are memoised separately (see
+`urn.evaluation.item_factor`).
+"""
+from collections import OrderedDict
+from collections.abc import Hashable, Mapping, Sequence
+from typing import Any
+
+from urn.computation import ComputationDescription, ComputationDescriptionError
+
+# Maximum number of term products kept by a session
+PRODUCT_CACHE_SIZE = 1024
+
+
+class TermProducts:
+    """Least recently used term products, keyed by the backend, bounds
+    and the item degree ranges of the term (see `urn.evaluation`).
+    """
+
+    def __init__(self, max_entries: int = PRODUCT_CACHE_SIZE) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._products: OrderedDict[Hashable, Any] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        try:
+            self._products.move_to_end(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._products[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._products[key] = value
+        self._products.move_to_end(key)
+        while len(self._products) > self.max_entries:
+            self._products.popitem(last=False)
+
+    def clear(self) -> None:
+        self._products.clear()
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+
+class Session:
+    """Named collections and term products kept between queries."""
+
+    def __init__(self, max_products: int = PRODUCT_CACHE_SIZE) -> None:
+        self.collections: dict[str, tuple[dict[str, int], dict[str, Sequence[int]]]] = {}
+        self.products = TermProducts(max_products)
+
+    def define(
+        self,
+        name: str,
+        collection: Mapping[str, int],
+        sweep: Mapping[str, Sequence[int]],
+    ) -> None:
+        """Define (or redefine) the named collection."""
+        self.collections[name] = dict(collection), dict(sweep)
+
+    def detached(self, name: str) -> "Session":
+        """New session with only a copy of the named collection (if it is
+        defined), e.g. to send to another process.
+        """
+        session = Session(self.products.max_entries)
+        if name in self.collections:
+            session.define(name, *self.collections[name])
+        return session
+
+    def use_collection(self, name: str, computation: ComputationDescription) -> None:
+        """Set the collection (and sweep) of the computation to the named one."""
+        if name not in self.collections:
+            raise ComputationDescriptionError(f"Unknown collection '{name}'.")
+        collection, sweep = self.collections[name]
+        computation.collection = dict(collection)
+        computation.sweep = dict(sweep)
@@ -1,24 +1,55 @@
 import cmd
 import sys
+from typing import IO, TYPE_CHECKING
 
 import lark
 
 from urn.computation import ComputationDescriptionError
 from urn.evaluation import process_query
+from urn.parsing import EOL
+from urn.profiling import Profile
+from urn.session import Session
+
+if TYPE_CHECKING:
+    from urn.cache import ResultCache
 
 
-EOL = ";"
 PROMPT = "urn> "
 PROMPT_CONTINUATION = " " * len(PROMPT)
 
 
 class UrnShell(cmd.Cmd):
-    """urn shell."""
+    """urn shell.
+
+    Queries share a session (see `urn.session`), so collections can be
+    defined by name and the work done for one query is reused by the next.
+    Ctrl+C stops the query being evaluated without leaving the shell.
+    """
     prompt = PROMPT
 
-    def __init__(self, parser: lark.Lark) -> None:
+    def __init__(
+        self,
+        parser: lark.Lark,
+        backend: str | None = None,
+        approximate: bool = False,
+        jobs: int = 1,
+        cache: "ResultCache | None" = None,
+        profile: bool = False,
+        max_cost: float | None = None,
+        timeout: float | None = None,
+        output_file: IO[bytes] | None = None,
+    ) -> None:
         super().__init__()
         self.parser = parser
+        self.backend = backend
+        self.approximate = approximate
+        self.jobs = jobs
+        self.cache = cache
+        self.profile = profile
+        self.max_cost = max_cost
+        self.timeout = timeout
+        self.output_file = output_file
+        self.session = Session()
         self.multiline_input = []
 
     def precmd(self, line: str) -> str:
@@ -38,11 +69,14 @@ class UrnShell(cmd.Cmd):
 
     def default(self, line: str) -> None:
         try:
-            print(self._process_input(line))
+            if result := self._process_input(line):
+                print(result)
         except ComputationDescriptionError as error:
             print(f"Computation error: {error}", file=sys.stderr)
         except lark.exceptions.LarkError as error:
             print(f"Parser error: {error}", file=sys.stderr)
+        except KeyboardInterrupt:
+            print("Query cancelled.", file=sys.stderr)
 
     def do_quit(self, _) -> bool:
         print("Exiting urn shell.")
@@ -53,4 +87,20 @@ class UrnShell(cmd.Cmd):
         pass
 
     def _process_input(self, query: str) -> str:
-        return process_query(self.parser, query)
+        profile = Profile() if self.profile else None
+        result = process_query(
+            self.parser,
+            query,
+            backend=self.backend,
+            approximate=self.approximate,
+            jobs=self.jobs,
+            cache=self.cache,
+            profile=profile,
+            session=self.session,
+            max_cost=self.max_cost,
+            timeout=self.timeout,
+            output_file=self.output_file,
+        )
+        if profile is not None:
+            print(profile.report(), file=sys.stderr)
+        return result
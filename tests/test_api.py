@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import urn
+from urn.computation import ComputationDescriptionError
+from urn.evaluation import process_query
+from urn.parsing import make_parser
+
+
+def test_probability_matches_query():
+    result = urn.probability(
+        {"red": 5, "blue": 7, "green": 3},
+        {"red": (2, None), "blue": (None, 5)},
+        sizes=range(2, 6),
+        exact=True,
+    )
+    query = (
+        "PROBABILITY DRAW 2..5 FROM red=5, blue=7, green=3 "
+        "WHERE red >= 2 AND blue <= 5 SHOW RATIONAL;"
+    )
+    table = process_query(make_parser(), query)
+    assert [str(value) for value in result] == table.split()[-7::2]
+
+
+def test_probability_array():
+    result = urn.probability({"red": 5, "blue": 3}, {"red": (2, None)}, sizes=[3, 4])
+    assert isinstance(result, np.ndarray)
+    np.testing.assert_allclose(result, [5 / 7, 13 / 14])
+
+
+@pytest.mark.parametrize(
+    ["constraints", "expected"],
+    [
+        pytest.param(None, [1, 8, 28, 56, 70, 56, 28, 8, 1], id="no constraints"),
+        pytest.param({"red": 3}, [0, 0, 0, 10, 30, 30, 10, 0, 0], id="int"),
+        pytest.param(
+            [{"red": 3}, {"blue": range(2, 4)}],
+            [0, 0, 3, 26, 65, 40, 25, 8, 1],
+            id="disjuncts",
+        ),
+    ],
+)
+def test_count(constraints, expected):
+    assert urn.count({"red": 5, "blue": 3}, constraints) == expected
+
+
+def test_count_with_replacement():
+    result = urn.count({"red": 5, "blue": 3}, {"red": 1}, sizes=3, replacement=True)
+    assert result == [3 * 5 * 3 ** 2]
+
+
+def test_count_not_exact():
+    result = urn.count({"red": 5, "blue": 3}, {"red": 1}, sizes=[1, 2], exact=False)
+    np.testing.assert_allclose(result, [5, 15])
+
+
+def test_unknown_item():
+    with pytest.raises(ComputationDescriptionError):
+        urn.count({"red": 5}, {"blue": 1})
+
+
+def test_invalid_bounds():
+    with pytest.raises(TypeError):
+        urn.count({"red": 5}, {"red": "many"})
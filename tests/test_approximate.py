@@ -0,0 +1,167 @@
+import math
+from fractions import Fraction
+
+import pytest
+
+from urn.approximate import Approximation
+from urn.computation import ComputationDescription, ComputationDescriptionError
+from urn.constants import ComputationType
+from urn.constraint import ConstraintItem
+from urn.evaluation import evaluate
+
+
+@pytest.mark.parametrize("with_replacement", [False, True])
+@pytest.mark.parametrize(
+    "computation_type", [ComputationType.COUNT, ComputationType.PROBABILITY]
+)
+@pytest.mark.parametrize(
+    "constraints",
+    [
+        pytest.param([], id="no constraints"),
+        pytest.param([[ConstraintItem("red", 0, 4)]], id="one constraint"),
+        pytest.param(
+            [
+                [ConstraintItem("red", 1, 4), ConstraintItem("blue", 0, 1)],
+                [ConstraintItem("green", 3, 7)],
+                [ConstraintItem("green", 3, 4), ConstraintItem("red", 2, 10)],
+            ],
+            id="three disjuncts",
+        ),
+    ],
+)
+def test_evaluate_approximate(with_replacement, computation_type, constraints):
+    if (
+        with_replacement
+        and not constraints
+        and computation_type == ComputationType.PROBABILITY
+    ):
+        pytest.skip("Probability with replacement requires constraints")
+
+    def computation(approximate):
+        computation = ComputationDescription(
+            computation_type=computation_type,
+            selection_range=range(10),
+            collection={"blue": 3, "red": 4, "green": 5, "yellow": 2, "white": 2},
+            constraints=constraints,
+            with_replacement=with_replacement,
+            approximate=approximate,
+        )
+        computation.finalise()
+        return computation
+
+    exact = evaluate(computation(approximate=False))
+    approximate = evaluate(computation(approximate=True))
+
+    for value, approximation in zip(exact, approximate, strict=True):
+        assert isinstance(approximation, Approximation)
+        assert abs(approximation.value - float(value)) <= approximation.error
+        assert approximation.error <= 1e-12 * max(1, float(value))
+
+
+def test_evaluate_approximate_large_collection():
+    computation = ComputationDescription(
+        computation_type=ComputationType.PROBABILITY,
+        selection_range=[2],
+        collection={"red": 10**6, "blue": 3 * 10**6},
+        constraints=[[ConstraintItem("red", 1, 2)]],
+        approximate=True,
+    )
+    computation.finalise()
+
+    [approximation] = evaluate(computation)
+
+    # Probability of exactly one red in two draws is 2 * 1/4 * 3/4
+    assert approximation.value == pytest.approx(0.375, abs=1e-6)
+    assert approximation.error < 1e-6
+
+
+def test_approximate_requires_selection_size():
+    computation = ComputationDescription(collection={"red": 5}, approximate=True)
+    with pytest.raises(ComputationDescriptionError):
+        computation.finalise()
+
+
+def test_approximate_count_with_replacement_from_empty_collection():
+    computation = ComputationDescription(
+        selection_range=range(3),
+        collection={"red": 0},
+        constraints=[[ConstraintItem("red", 0, 3)]],
+        with_replacement=True,
+        approximate=True,
+    )
+    computation.finalise()
+
+    assert [a.value for a in evaluate(computation)] == [1, 0, 0]
+
+
+@pytest.mark.parametrize("approximate", [False, True])
+def test_probability_with_replacement_from_empty_collection(approximate):
+    computation = ComputationDescription(
+        computation_type=ComputationType.PROBABILITY,
+        selection_range=[2],
+        collection={"red": 0},
+        constraints=[[ConstraintItem("red", 1, 3)]],
+        with_replacement=True,
+        approximate=approximate,
+    )
+    with pytest.raises(ComputationDescriptionError, match="empty collection"):
+        computation.finalise()
+
+
+@pytest.mark.parametrize(
+    "computation_type, selection_range, collection, constraints",
+    [
+        pytest.param(
+            ComputationType.COUNT,
+            range(3, 28),
+            {"a": 58, "b": 42, "c": 5, "d": 48, "e": 52, "f": 54},
+            [],
+            id="count",
+        ),
+        pytest.param(
+            ComputationType.PROBABILITY,
+            [1],
+            {"a": 12, "b": 15, "c": 5, "d": 11, "e": 21},
+            [
+                [
+                    ConstraintItem("d", 0, 4),
+                    ConstraintItem("e", 0, 3),
+                    ConstraintItem("c", 1, math.inf),
+                ]
+            ],
+            id="probability",
+        ),
+    ],
+)
+def test_evaluate_approximate_error_bound(
+    computation_type, selection_range, collection, constraints
+):
+    def computation(approximate):
+        computation = ComputationDescription(
+            computation_type=computation_type,
+            selection_range=selection_range,
+            collection=collection,
+            constraints=constraints,
+            approximate=approximate,
+        )
+        computation.finalise()
+        return computation
+
+    exact = evaluate(computation(approximate=False))
+    approximate = evaluate(computation(approximate=True))
+
+    for value, approximation in zip(exact, approximate, strict=True):
+        error = abs(Fraction(approximation.value) - Fraction(value))
+        assert error <= Fraction(approximation.error)
+
+
+def test_evaluate_approximate_zero_count_with_overflowing_scale():
+    computation = ComputationDescription(
+        selection_range=[5000],
+        collection={"a": 5_000_000, "b": 3_000_000},
+        constraints=[[ConstraintItem("a", 5001, math.inf)]],
+        approximate=True,
+    )
+    computation.finalise()
+
+    assert evaluate(computation) == [Approximation(0.0, 0.0)]
@@ -0,0 +1,77 @@
+import pytest
+
+from urn.budget import WORD_BITS, BudgetError, enforce_max_cost, estimate_cost
+from urn.computation import ComputationDescription
+from urn.constants import ComputationType
+from urn.constraint import ConstraintItem
+from urn.evaluation import process_query
+from urn.parsing import make_parser
+
+
+def make_computation(n_disjuncts, count=5, selection_range=range(1, 6), **kwargs):
+    computation = ComputationDescription(
+        computation_type=ComputationType.PROBABILITY,
+        selection_range=selection_range,
+        collection={f"i{n}": count for n in range(n_disjuncts + 1)},
+        constraints=[[ConstraintItem(f"i{n}", 2)] for n in range(n_disjuncts)],
+        **kwargs,
+    )
+    computation.finalise()
+    return computation
+
+
+def test_estimate_cost():
+    cost = estimate_cost(make_computation(3))
+    assert (cost.terms, cost.items, cost.degree, cost.repeats) == (3, 4, 6, 1)
+    assert cost.split == "disjoint boxes"
+    assert cost.bits == (20 * 19 * 18 * 17 * 16 // 120).bit_length()
+    assert cost.operations == 3 * 4 * 36 + 9 * 4
+
+
+def test_estimate_cost_approximate_and_sweep():
+    computation = make_computation(2, approximate=True, sweep={"i0": range(1, 4)})
+    cost = estimate_cost(computation)
+    assert (cost.bits, cost.repeats) == (WORD_BITS, 3)
+
+
+def test_estimate_cost_counts_terms():
+    # One disjoint box for each disjunct, rather than 2 ** 25 - 1 terms
+    assert estimate_cost(make_computation(25)).terms == 25
+
+
+def test_estimate_cost_bounds_terms_too_slow_to_count(monkeypatch):
+    monkeypatch.setattr("urn.budget.COUNT_TERMS_TIMEOUT", 0)
+    cost = estimate_cost(make_computation(25))
+    assert (cost.terms, cost.split) == (2 ** 25 - 1, None)
+
+
+@pytest.mark.parametrize("n_disjuncts", [3, 25])
+def test_enforce_max_cost_within_budget(n_disjuncts):
+    computation = make_computation(n_disjuncts)
+    cost = enforce_max_cost(computation, 10 ** 5)
+    assert cost == estimate_cost(computation)
+    assert not computation.approximate
+
+
+def test_enforce_max_cost_falls_back_to_approximate():
+    computation = make_computation(1, count=10 ** 6, selection_range=range(300, 301))
+    exact = estimate_cost(computation).operations
+    cost = enforce_max_cost(computation, exact - 1)
+    assert computation.approximate
+    assert cost == estimate_cost(computation)
+
+
+def test_enforce_max_cost_rejects(monkeypatch):
+    monkeypatch.setattr("urn.budget.COUNT_TERMS_TIMEOUT", 0)
+    with pytest.raises(BudgetError, match="over the budget"):
+        enforce_max_cost(make_computation(25), 10 ** 9)
+
+
+def test_process_query_budget():
+    parser = make_parser()
+    query = "COUNT DRAW 3 FROM a=4, b=5 WHERE a = 1 OR b = 2;"
+    assert process_query(parser, query, max_cost=10 ** 6, timeout=60)
+    with pytest.raises(BudgetError):
+        process_query(parser, query, max_cost=1)
+    with pytest.raises(BudgetError, match="time limit"):
+        process_query(parser, query, timeout=0)
@@ -0,0 +1,156 @@
+import pickle
+
+import pytest
+
+from urn.cache import ResultCache, computation_key, evaluate_cached
+from urn.evaluation import process_query
+from urn.parsing import BuildComputation, make_parser
+
+
+@pytest.fixture(scope="module")
+def parser():
+    return make_parser()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with ResultCache(tmp_path / "results.sqlite") as cache:
+        yield cache
+
+
+def key(parser, query):
+    build = BuildComputation().transform(parser.parse(query))
+    build.computation.finalise()
+    return computation_key(build.computation)
+
+
+@pytest.mark.parametrize(
+    ["query_a", "query_b"],
+    [
+        pytest.param(
+            "COUNT DRAW 4 FROM red=5, blue=3 WHERE red >= 2;",
+            "COUNT   DRAW 4 FROM blue=3,red=5 WHERE red>=2;",
+            id="item order and spacing",
+        ),
+        pytest.param(
+            "COUNT DRAW 4 FROM red=5, blue=3 WHERE red >= 2 AND red >= 1;",
+            "COUNT DRAW 4 FROM red=5, blue=3 WHERE red >= 2 AND blue <= 9;",
+            id="redundant constraints",
+        ),
+        pytest.param(
+            "COUNT DRAW 4 FROM red=5, blue=3 WHERE red >= 2 OR blue = 1;",
+            "COUNT DRAW 4 FROM red=5, blue=3 WHERE blue = 1 OR red >= 2;",
+            id="disjunct order",
+        ),
+        pytest.param(
+            "PROBABILITY DRAW 4 FROM red=5, blue=3, green=2 WHERE red >= 2;",
+            "PROBABILITY DRAW 4 FROM red=5, green=5 WHERE red >= 2;",
+            id="unconstrained items merged",
+        ),
+    ],
+)
+def test_computation_key_equal(parser, query_a, query_b):
+    assert key(parser, query_a) == key(parser, query_b)
+
+
+@pytest.mark.parametrize(
+    ["query_a", "query_b"],
+    [
+        pytest.param(
+            "COUNT DRAW 4 FROM red=5, blue=3 WHERE red >= 2;",
+            "PROBABILITY DRAW 4 FROM red=5, blue=3 WHERE red >= 2;",
+            id="computation type",
+        ),
+        pytest.param(
+            "COUNT DRAW 4 FROM red=5, blue=3 WHERE red >= 2;",
+            "COUNT DRAW 4 WITH REPLACEMENT FROM red=5, blue=3 WHERE red >= 2;",
+            id="replacement",
+        ),
+        pytest.param(
+            "COUNT DRAW 4 FROM red=5, blue=3 WHERE red >= 2;",
+            "COUNT DRAW 3 FROM red=5, blue=3 WHERE red >= 2;",
+            id="draw size",
+        ),
+    ],
+)
+def test_computation_key_not_equal(parser, query_a, query_b):
+    assert key(parser, query_a) != key(parser, query_b)
+
+
+def test_computation_key_random_estimate_not_cached(parser):
+    query = "ESTIMATE DRAW 4 FROM red=5, blue=3 WHERE red >= 2 SAMPLES 100;"
+    assert key(parser, query) is None
+    assert key(parser, query.replace(";", " SEED 1;")) is not None
+
+
+def test_evaluate_cached(parser, cache, monkeypatch):
+    query = "COUNT DRAW FROM red=5, blue=3 WHERE red >= 2;"
+    expected = process_query(parser, query)
+
+    assert process_query(parser, query, cache=cache) == expected
+    assert len(cache) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Evaluated despite cached result")
+
+    monkeypatch.setattr("urn.evaluation.evaluate", fail)
+    assert process_query(parser, query, cache=cache) == expected
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    with ResultCache(tmp_path / "results.sqlite", max_entries=2) as cache:
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+
+def test_cache_cleared_on_new_version(tmp_path, monkeypatch):
+    path = tmp_path / "results.sqlite"
+    with ResultCache(path) as cache:
+        cache.put("a", 1)
+
+    monkeypatch.setattr("urn.cache.__version__", "999")
+    with ResultCache(path) as cache:
+        assert cache.get("a") is None
+
+
+def test_cache_pickles_without_connection(cache):
+    cache.put("a", 1)
+    with pickle.loads(pickle.dumps(cache)) as copy:
+        assert copy.get("a") == 1
+
+
+def test_evaluate_cached_keeps_implied_selection_range(parser, cache):
+    query = "COUNT DRAW FROM red=2 WHERE red >= 1;"
+    build = BuildComputation().transform(parser.parse(query))
+    build.computation.finalise()
+    result = evaluate_cached(build.computation, cache)
+
+    build = BuildComputation().transform(parser.parse(query))
+    build.computation.finalise()
+    assert evaluate_cached(build.computation, cache) == result
+    assert list(build.computation.selection_range) == [1, 2]
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        pytest.param("file/results.sqlite", id="not a directory"),
+        pytest.param("results.sqlite", id="not a database"),
+    ],
+)
+def test_unusable_cache_is_disabled(parser, tmp_path, capsys, name):
+    (tmp_path / "file").write_text("not a directory")
+    (tmp_path / "results.sqlite").write_text("not a database" * 100)
+    query = "COUNT DRAW 1 FROM red=2;"
+    with ResultCache(tmp_path / name) as cache:
+        first = process_query(parser, query, cache=cache)
+        second = process_query(parser, query, cache=cache)
+
+    assert first == second == process_query(parser, query)
+    assert cache.disabled
+    assert capsys.readouterr().err.count("Cache error") == 1
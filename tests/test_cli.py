@@ -0,0 +1,114 @@
+import io
+
+from urn.cli import run_batch
+from urn.parsing import make_parser
+
+
+def test_run_batch_reports_bad_queries_and_continues(capsys):
+    lines = [
+        "COUNT DRAW 3 FROM a=4, b=5 WHERE a >= 1;\n",
+        "COUNT DRAW 2 FROM a=4 WHERE b >= 1;\n",
+        "COUNT NOTHING;\n",
+        "COUNT DRAW 1 FROM a=2;\n",
+    ]
+
+    success = run_batch(make_parser(), lines)
+
+    captured = capsys.readouterr()
+    assert not success
+    assert "74" in captured.out
+    assert "Query 2: Computation error" in captured.err
+    assert "Query 3: Command parsing error" in captured.err
+    assert captured.out.rstrip().endswith("1        2")
+
+
+def test_run_batch_jobs(capsys):
+    lines = [
+        "COUNT DRAW 3 FROM a=4, b=5 WHERE a >= 1;\n",
+        "COUNT NOTHING;\n",
+        "COUNT DRAW 1 FROM a=2;\n",
+    ]
+
+    success = run_batch(make_parser(), lines, jobs=2)
+
+    captured = capsys.readouterr()
+    assert not success
+    assert captured.out.index("74") < captured.out.index("1        2")
+    assert "Query 2: Command parsing error" in captured.err
+
+
+def test_run_batch_profile(capsys):
+    lines = ["COUNT DRAW 3 FROM a=4, b=5 WHERE a >= 1;\n"]
+
+    success = run_batch(make_parser(), lines, profile=True)
+
+    captured = capsys.readouterr()
+    assert success
+    assert "multiplications" not in captured.out
+    assert "Query 1 profile:" in captured.err
+    assert "multiplications" in captured.err
+
+
+def test_run_batch_named_collection(capsys):
+    lines = [
+        "LET deck = a=4, b=5;\n",
+        "COUNT DRAW 3 FROM deck WHERE a >= 1;\n",
+    ]
+
+    success = run_batch(make_parser(), lines)
+
+    captured = capsys.readouterr()
+    assert success
+    assert captured.out.startswith("  draw size")
+    assert "74" in captured.out
+
+
+def test_run_batch_jobs_named_collection(capsys):
+    lines = [
+        "LET deck = a=4, b=5;\n",
+        "COUNT DRAW 3 FROM deck WHERE a >= 1;\n",
+        "LET deck = a=2;\n",
+        "COUNT DRAW 1 FROM deck;\n",
+        "COUNT DRAW 1 FROM nothing;\n",
+    ]
+
+    success = run_batch(make_parser(), lines, jobs=2)
+
+    captured = capsys.readouterr()
+    assert not success
+    assert captured.out.index("74") < captured.out.index("1        2")
+    assert captured.err.strip() == "Query 5: Computation error: Unknown collection 'nothing'."
+
+
+def test_run_batch_budget(capsys):
+    lines = [
+        "COUNT DRAW 3 FROM a=4, b=5 WHERE a = 1 OR b = 2;\n",
+        "COUNT DRAW 1 FROM a=2;\n",
+    ]
+
+    success = run_batch(make_parser(), lines, max_cost=50, timeout=60)
+
+    captured = capsys.readouterr()
+    assert not success
+    assert "Query 1: Computation error: Estimated cost" in captured.err
+    assert captured.out.rstrip().endswith("1        2")
+
+
+def test_run_batch_output_file(capsys):
+    lines = [
+        "COUNT DRAW 1..2 FROM a=2 SHOW JSON;\n",
+        "COUNT DRAW 1 FROM a=2 SHOW CSV;\n",
+    ]
+    file = io.BytesIO()
+
+    success = run_batch(make_parser(), lines, jobs=2, output_file=file)
+
+    captured = capsys.readouterr()
+    assert success
+    assert captured.out == ""
+    assert file.getvalue().decode().splitlines() == [
+        '{"draw size": 1, "count": 2}',
+        '{"draw size": 2, "count": 1}',
+        "draw size,count",
+        "1,2",
+    ]
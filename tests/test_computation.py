@@ -0,0 +1,60 @@
+from urn.computation import ComputationDescription
+from urn.constants import AGGREGATE_ITEM
+from urn.constraint import ConstraintItem
+
+
+def test_reduced_merges_unconstrained_items():
+
+    computation = ComputationDescription(
+        selection_range=range(3, 8),
+        collection={"A": 5, "B": 3, "C": 4, "D": 6},
+        constraints=[[ConstraintItem("B", 1)], [ConstraintItem("A", 0, 6)]],
+    )
+    computation.finalise()
+
+    reduced = computation.reduced()
+
+    # A <= 5 holds for every draw, so only B remains constrained
+    assert reduced.collection == {"B": 3, AGGREGATE_ITEM: 15}
+    assert reduced.constraints == [[ConstraintItem("B", 1)], []]
+    assert reduced.collection_size() == computation.collection_size()
+
+
+def test_reduced_no_constraints():
+
+    computation = ComputationDescription(collection={"A": 5, "B": 3})
+    computation.finalise()
+
+    reduced = computation.reduced()
+
+    assert reduced.collection == {AGGREGATE_ITEM: 8}
+    assert reduced.constraints == [[]]
+
+
+def test_reduced_single_unconstrained_item_is_kept():
+
+    computation = ComputationDescription(
+        selection_range=[4],
+        collection={"A": 5, "B": 3},
+        constraints=[[ConstraintItem("B", 1)]],
+        with_replacement=True,
+    )
+    computation.finalise()
+
+    reduced = computation.reduced()
+
+    assert reduced.collection == {"A": 5, "B": 3}
+    assert reduced.constraints == [[ConstraintItem("B", 1)]]
+
+
+def test_reduced_with_replacement_no_constraints():
+
+    computation = ComputationDescription(
+        selection_range=[4], collection={"A": 5, "B": 3}, with_replacement=True
+    )
+    computation.finalise()
+
+    reduced = computation.reduced()
+
+    assert reduced.collection == {AGGREGATE_ITEM: 8}
+    assert reduced.constraints == [[]]
@@ -1,4 +1,10 @@
-from urn.constraint import ConstraintItem, union_constraint_disjuncts
+import itertools
+
+from urn.constraint import (
+    ConstraintItem,
+    disjoint_constraint_boxes,
+    union_constraint_disjuncts,
+)
 
 
 def test_constraint_and():
@@ -32,3 +38,60 @@ def test_union_constraint_disjuncts():
         (1, {"A": ConstraintItem("A", min_=3, max_=5)}),
         (2, {"A": ConstraintItem("A", min_=3, max_=5)}),
     ]
+
+
+def test_disjoint_constraint_boxes():
+
+    constraints = [
+        [ConstraintItem("A", min_=2, max_=7)],
+        [ConstraintItem("A", min_=3, max_=9), ConstraintItem("B", max_=2)],
+        [ConstraintItem("B", min_=1, max_=3)],
+    ]
+    limits = {"A": 10, "B": 5}
+
+    boxes = disjoint_constraint_boxes(constraints, limits)
+
+    def in_box(a, b, box):
+        return all(
+            box[name].min_ <= count < box[name].max_
+            for name, count in (("A", a), ("B", b))
+        )
+
+    for a, b in itertools.product(range(10), range(5)):
+        in_union = any(
+            all(c.min_ <= {"A": a, "B": b}[c.name] < c.max_ for c in disjunct)
+            for disjunct in constraints
+        )
+        assert sum(in_box(a, b, box) for box in boxes) == int(in_union)
+
+
+def test_disjoint_constraint_boxes_max_boxes():
+
+    constraints = [
+        [ConstraintItem("A", min_=n, max_=n+3), ConstraintItem("B", min_=n)]
+        for n in range(4)
+    ]
+
+    assert disjoint_constraint_boxes(constraints, {"A": 9, "B": 9}, 2) is None
+
+
+def test_union_constraint_disjuncts_prunes_infeasible():
+
+    constraints = [
+        [ConstraintItem("A", min_=4)],
+        [ConstraintItem("A", max_=2)],
+        [ConstraintItem("B", min_=1)],
+        [ConstraintItem("C", min_=3)],
+    ]
+
+    union = list(
+        union_constraint_disjuncts(constraints, limits={"A": 6, "C": 3}, size_bound=6)
+    )
+
+    assert union == [
+        (1, {"A": ConstraintItem("A", min_=4)}),
+        (1, {"A": ConstraintItem("A", max_=2)}),
+        (1, {"B": ConstraintItem("B", min_=1)}),
+        (2, {"A": ConstraintItem("A", min_=4), "B": ConstraintItem("B", min_=1)}),
+        (2, {"A": ConstraintItem("A", max_=2), "B": ConstraintItem("B", min_=1)}),
+    ]
@@ -0,0 +1,36 @@
+import time
+
+import pytest
+
+from urn.computation import ComputationDescription
+from urn.constants import ComputationType
+from urn.constraint import ConstraintItem
+from urn.deadline import TimeLimitError, check_time, remaining_time, time_limit
+from urn.evaluation import evaluate
+
+
+def test_time_limit():
+    assert remaining_time() is None
+    with time_limit(60):
+        assert 0 < remaining_time() <= 60
+        with time_limit(None):
+            assert remaining_time() is not None
+        with time_limit(0):
+            time.sleep(0.001)
+            with pytest.raises(TimeLimitError):
+                check_time()
+        check_time()
+    assert remaining_time() is None
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_evaluate_stops_at_time_limit(jobs):
+    computation = ComputationDescription(
+        computation_type=ComputationType.PROBABILITY,
+        selection_range=range(1, 6),
+        collection={f"i{n}": 5 for n in range(7)},
+        constraints=[[ConstraintItem(f"i{n}", 2)] for n in range(6)],
+    )
+    computation.finalise()
+    with time_limit(0), pytest.raises(TimeLimitError, match="time limit"):
+        evaluate(computation, jobs=jobs)
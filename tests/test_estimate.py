@@ -0,0 +1,49 @@
+import pytest
+
+from urn.computation import ComputationDescription, ComputationDescriptionError
+from urn.constants import ComputationType
+from urn.constraint import ConstraintItem
+from urn.estimate import evaluate_estimate
+from urn.evaluation import evaluate
+
+
+def make_computation(computation_type, with_replacement, samples=None, seed=None):
+    computation = ComputationDescription(
+        computation_type=computation_type,
+        selection_range=range(2, 7),
+        collection={"blue": 3, "red": 4, "green": 5},
+        constraints=[
+            [ConstraintItem("red", 1, 4), ConstraintItem("blue", 0, 1)],
+            [ConstraintItem("green", 3, 7)],
+        ],
+        with_replacement=with_replacement,
+        samples=samples,
+        seed=seed,
+    )
+    computation.finalise()
+    return computation
+
+
+@pytest.mark.parametrize("with_replacement", [False, True])
+def test_evaluate_estimate(with_replacement):
+    exact = evaluate(make_computation(ComputationType.PROBABILITY, with_replacement))
+    estimates = evaluate(
+        make_computation(ComputationType.ESTIMATE, with_replacement, 40000, seed=7)
+    )
+    for value, estimate in zip(exact, estimates, strict=True):
+        assert estimate.low <= float(value) <= estimate.high
+        assert estimate.high - estimate.low < 0.02
+
+
+def test_evaluate_estimate_reproducible():
+    computation = make_computation(ComputationType.ESTIMATE, False, 40000, seed=3)
+
+    first = evaluate_estimate(computation)
+    second = evaluate_estimate(computation, workers=2)
+
+    assert first == second
+
+
+def test_estimate_requires_samples():
+    with pytest.raises(ComputationDescriptionError):
+        make_computation(ComputationType.ESTIMATE, False)
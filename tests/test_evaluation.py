@@ -1,11 +1,16 @@
+import copy
+import itertools
+import math
+from math import prod
+
 import pytest
-from sympy import Poly, Rational, binomial
-from sympy.abc import x
+from sympy import Rational, binomial
 
-from urn.evaluation import make_count_draw_polynomials, evaluate
+from urn.evaluation import make_count_draw_polynomials, evaluate, item_factor
 from urn.constraint import ConstraintItem
 from urn.computation import ComputationDescription
 from urn.constants import ComputationType, ComputationAction
+from urn.polynomial import PythonBackend
 
 
 @pytest.mark.parametrize(
@@ -20,56 +25,56 @@ from urn.constants import ComputationType, ComputationAction
             {"a": 5},
             {"a": ConstraintItem("a", min_=0)},
             3,
-            [Poly(10*x**2 + 5*x + 1, x)],
+            [[1, 5, 10]],
             id="5a, a>=0, selection 0..2",
         ),
         pytest.param(
             {"a": 5},
             {"a": ConstraintItem("a", min_=1)},
             3,
-            [Poly(10*x**2 + 5*x + 0, x)],
+            [[0, 5, 10]],
             id="5a, a>=1, selection 0..2",
         ),
         pytest.param(
             {"a": 4},
             {"a": ConstraintItem("a", min_=2)},
             3,
-            [Poly(6*x**2 + 0*x + 0, x)],
+            [[0, 0, 6]],
             id="4a, a>=2, selection 0..2",
         ),
         pytest.param(
             {"a": 4},
             {"a": ConstraintItem("a", min_=2)},
             2,
-            [Poly(0*x + 0, x)],
+            [[]],
             id="4a, a>=2, selection 0..1",
         ),
         pytest.param(
             {"a": 2},
             {"a": ConstraintItem("a", min_=3)},
             3,
-            [Poly(0*x**2 + 0*x + 0, x)],
+            [[]],
             id="2a, a>=3, selection 0..2",
         ),
         pytest.param(
             {"a": 2},
             {},
             3,
-            [Poly(x**2 + 2*x + 1, x)],
+            [[1, 2, 1]],
             id="2a, no constraint, selection 0..2",
         ),
         pytest.param(
             {"a": 2, "b": 5},
             {},
             3,
-            [Poly(x**2 + 2*x + 1, x), Poly(10*x**2 + 5*x + 1, x)],
+            [[1, 2, 1], [1, 5, 10]],
             id="2a, 5b, no constraint, selection 0..2",
         ),
         pytest.param(
             {"a": 2, "b": 5},
             {"b": ConstraintItem("b", max_=2)},
             4,
-            [Poly(x**2 + 2*x + 1, x), Poly(5*x + 1, x)],
+            [[1, 2, 1], [1, 5]],
             id="2a, 5b, b<=1, selection 0..3",
         ),
     ],
@@ -78,7 +83,7 @@ def test_make_count_draw_polynomials(
     collection, constraints, selection_upper_bound, expected_polynomials
 ):    
     polys = make_count_draw_polynomials(
-        collection, constraints, selection_upper_bound
+        collection, constraints, selection_upper_bound, PythonBackend()
     )
     assert polys == expected_polynomials
 
@@ -273,6 +278,173 @@ def test_make_count_draw_polynomials(
         ),
     ]
 )
-def test_evaluate(computation, expected_result):
+@pytest.mark.parametrize("backend", ["python", "gmpy2", "flint"])
+def test_evaluate(computation, expected_result, backend):
+    pytest.importorskip({"python": "math", "gmpy2": "gmpy2", "flint": "flint"}[backend])
+    computation = copy.deepcopy(computation)
+    computation.finalise()
+    assert evaluate(computation, backend=backend) == expected_result
+
+
+@pytest.mark.parametrize("with_replacement", [False, True])
+def test_evaluate_many_disjuncts(with_replacement):
+    collection = {"red": 4, "blue": 3, "green": 5}
+    constraints = [
+        [ConstraintItem("red", n % 4, n % 4 + 1), ConstraintItem("blue", n % 3)]
+        for n in range(10)
+    ] + [[ConstraintItem("green", 4)]]
+    computation = ComputationDescription(
+        computation_type=ComputationType.COUNT,
+        selection_range=[3, 4, 5, 6],
+        collection=collection,
+        constraints=constraints,
+        with_replacement=with_replacement,
+    )
+    computation.finalise()
+
+    # Count draws by enumerating the number of each item drawn
+    def satisfies(counts):
+        return any(
+            all(c.min_ <= counts[c.name] < c.max_ for c in disjunct)
+            for disjunct in constraints
+        )
+
+    expected = []
+    for size in computation.selection_range:
+        total = 0
+        for draw in itertools.product(*(range(size + 1) for _ in collection)):
+            counts = dict(zip(collection, draw))
+            if sum(draw) != size or not satisfies(counts):
+                continue
+            if with_replacement:
+                arrangements = math.factorial(size) // prod(map(math.factorial, draw))
+                total += arrangements * prod(
+                    collection[name] ** n for name, n in counts.items()
+                )
+            else:
+                total += prod(
+                    math.comb(collection[name], n) for name, n in counts.items()
+                )
+        expected.append(total)
+
+    assert evaluate(computation, backend="python") == expected
+
+
+def test_evaluate_grouped_items():
+    # Draws of 6 singletons that include each of the first four
+    collection = {f"card{n}": 1 for n in range(30)}
+    computation = ComputationDescription(
+        selection_range=[6],
+        collection=collection,
+        constraints=[[ConstraintItem(f"card{n}", 1) for n in range(4)]],
+    )
+    computation.finalise()
+    assert evaluate(computation) == [math.comb(26, 2)]
+
+
+@pytest.mark.parametrize("with_replacement", [False, True])
+@pytest.mark.parametrize("size", [0, 3, 7, 12])
+def test_evaluate_single_size(with_replacement, size):
+    def computation(selection_range):
+        computation = ComputationDescription(
+            computation_type=ComputationType.PROBABILITY,
+            selection_range=selection_range,
+            collection={"blue": 3, "red": 4, "green": 5},
+            constraints=[
+                [ConstraintItem("red", 1, 4), ConstraintItem("blue", 0, 1)],
+                [ConstraintItem("green", 3, 7)],
+            ],
+            with_replacement=with_replacement,
+        )
+        computation.finalise()
+        return computation
+
+    expected = evaluate(computation(range(13)))[size]
+    assert evaluate(computation([size])) == [expected]
+
+
+@pytest.mark.parametrize("with_replacement", [False, True])
+def test_evaluate_jobs(with_replacement):
+    def computation():
+        computation = ComputationDescription(
+            computation_type=ComputationType.PROBABILITY,
+            selection_range=range(10),
+            collection={"blue": 3, "red": 4, "green": 5},
+            constraints=[
+                [ConstraintItem("red", 1, 4), ConstraintItem("blue", 0, 1)],
+                [ConstraintItem("green", 3, 7)],
+                [ConstraintItem("blue", 2)],
+            ],
+            with_replacement=with_replacement,
+        )
+        computation.finalise()
+        return computation
+
+    assert evaluate(computation(), jobs=2) == evaluate(computation())
+
+
+def test_item_factors_are_memoised():
+    def computation():
+        computation = ComputationDescription(
+            selection_range=range(8),
+            collection={"red": 6, "blue": 5, "green": 7},
+            constraints=[[ConstraintItem("red", 2)], [ConstraintItem("blue", 3)]],
+        )
+        computation.finalise()
+        return computation
+
+    expected = evaluate(computation(), backend="python")
+    before = item_factor.cache_info()
+    assert evaluate(computation(), backend="python") == expected
+    after = item_factor.cache_info()
+    assert after.misses == before.misses
+    assert after.hits > before.hits
+
+
+@pytest.mark.parametrize("with_replacement", [False, True])
+@pytest.mark.parametrize("approximate", [False, True])
+def test_evaluate_sweep(with_replacement, approximate):
+    computation = ComputationDescription(
+        computation_type=ComputationType.PROBABILITY,
+        selection_range=range(2, 9),
+        collection={"blue": 3, "green": 2},
+        sweep={"red": range(4)},
+        constraints=[
+            [ConstraintItem("red", 1), ConstraintItem("blue", 0, 2)],
+            [ConstraintItem("green", 2)],
+        ],
+        with_replacement=with_replacement,
+        approximate=approximate,
+    )
+    computation.finalise()
+    result = evaluate(computation)
+
+    assert len(result) == 4
+    for point, values in zip(computation.sweep_points(), result, strict=True):
+        single = ComputationDescription(
+            computation_type=ComputationType.PROBABILITY,
+            selection_range=range(2, 9),
+            collection={"blue": 3, "green": 2, **point},
+            constraints=computation.constraints,
+            with_replacement=with_replacement,
+            approximate=approximate,
+        )
+        single.finalise()
+        expected = evaluate(single)
+        # Sizes larger than the collection at a point have no value
+        assert values[len(expected):] == [None] * (7 - len(expected))
+        assert values[:len(expected)] == expected
+
+
+@pytest.mark.parametrize("with_replacement", [False, True])
+def test_evaluate_sweep_jobs(with_replacement):
+    computation = ComputationDescription(
+        computation_type=ComputationType.PROBABILITY,
+        selection_range=range(1, 6),
+        collection={"blue": 3},
+        sweep={"red": range(5)},
+        constraints=[[ConstraintItem("red", 1)], [ConstraintItem("blue", 2)]],
+        with_replacement=with_replacement,
+    )
     computation.finalise()
-    assert evaluate(computation) == expected_result
+    assert evaluate(computation, jobs=2) == evaluate(computation)
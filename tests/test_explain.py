@@ -0,0 +1,85 @@
+import pytest
+
+from urn.evaluation import process_query
+from urn.parsing import make_parser
+from urn.session import Session
+
+
+@pytest.fixture(scope="module")
+def parser():
+    return make_parser()
+
+
+def explain(parser, query, **options):
+    """Return the rows of the plan for the query as a dict."""
+    lines = process_query(parser, f"EXPLAIN {query}", **options).splitlines()
+    width = lines[1].index(" ")
+    return {line[:width].strip(): line[width:].strip() for line in lines[2:]}
+
+
+def test_explain(parser):
+    query = (
+        "PROBABILITY DRAW 3..5 FROM red=4, blue=5, green=3, black=2 "
+        "WHERE red >= 2 AND blue < 3 OR blue = 1;"
+    )
+    rows = explain(parser, query)
+    assert rows["engine"] == "exact"
+    assert rows["collection"] == "red=4, blue=5, <other>=5"
+    assert rows["disjunct 1"] == "red >= 2 AND blue < 3"
+    assert rows["disjunct 2"] == "blue = 1"
+    assert rows["terms"] == "2 (disjoint boxes)"
+    assert rows["max degree"] == "5"
+    assert "estimated operations" in rows
+
+
+def test_explain_does_not_evaluate(parser, monkeypatch):
+    def fail(*_, **__):
+        raise AssertionError("evaluated")
+
+    monkeypatch.setattr("urn.evaluation.evaluate", fail)
+    rows = explain(parser, "COUNT DRAW 2 FROM red=5, blue=7 WHERE red = 1;")
+    assert rows["terms"] == "1 (disjoint boxes)"
+
+
+@pytest.mark.parametrize(
+    ["query", "engine"],
+    [
+        ("COUNT DRAW 2 FROM a=2, b=3 WHERE a = 1 SHOW FLOAT FAST;", "floating point"),
+        ("COUNT DRAW 2 WITH REPLACEMENT FROM a=2, b=3;", "closed form"),
+        (
+            "ESTIMATE DRAW 2 FROM a=2, b=3 WHERE a = 1 SAMPLES 100;",
+            "sampling (100 samples)",
+        ),
+    ],
+)
+def test_explain_engine(parser, query, engine):
+    assert explain(parser, query)["engine"] == engine
+
+
+def test_explain_budget(parser):
+    query = "COUNT DRAW 300 FROM a=4000, b=5000 WHERE a = 1 OR b = 2;"
+    assert explain(parser, query, max_cost=100)["budget"].endswith("rejected)")
+    rows = explain(parser, query, max_cost=10 ** 6)
+    assert rows["budget"] == "1e+06 (exceeded: evaluated in floating point)"
+    assert rows["engine"] == "floating point"
+
+
+def test_explain_named_collection(parser):
+    session = Session()
+    process_query(parser, "LET deck = red=4, blue=5;", session=session)
+    rows = explain(parser, "COUNT DRAW 2 FROM deck WHERE red = 1;", session=session)
+    assert rows["collection"] == "red=4, blue=5"
+
+
+def test_explain_operations_from_terms_shown(parser, monkeypatch):
+    items = ", ".join(f"i{n}=5" for n in range(26))
+    clauses = " OR ".join(f"i{n} >= 2" for n in range(25))
+    query = f"COUNT DRAW 5 FROM {items} WHERE {clauses};"
+    rows = explain(parser, query)
+    assert rows["terms"] == "25 (disjoint boxes)"
+    assert float(rows["estimated operations"]) < 10 ** 6
+
+    monkeypatch.setattr("urn.budget.COUNT_TERMS_TIMEOUT", 0)
+    rows = explain(parser, query)
+    assert rows["terms"] == f"up to {2 ** 25 - 1} (too many to count)"
+    assert float(rows["estimated operations"]) > 10 ** 15
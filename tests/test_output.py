@@ -0,0 +1,151 @@
+import io
+import json
+from fractions import Fraction
+from math import comb
+
+import pytest
+
+from urn.approximate import Approximation
+from urn.computation import ComputationDescription, ComputationDescriptionError
+from urn.constants import ComputationType, OutputFormat
+from urn.estimate import Estimate
+from urn.output import Output
+
+
+def make_sweep():
+    computation = ComputationDescription(
+        computation_type=ComputationType.PROBABILITY,
+        selection_range=range(1, 3),
+        collection={"blue": 1},
+        sweep={"red": range(2)},
+    )
+    computation.finalise()
+    evaluation = [[Fraction(1), None], [Fraction(1, 2), Fraction(1)]]
+    return computation, evaluation
+
+
+def test_csv():
+    computation = ComputationDescription(
+        computation_type=ComputationType.COUNT,
+        selection_range=range(1, 3),
+        collection={"red": 2},
+    )
+    output = Output(output_fmt=OutputFormat.CSV).output(computation, [2, 1])
+    assert output == "draw size,count\n1,2\n2,1"
+
+
+def test_csv_sweep():
+    computation, evaluation = make_sweep()
+    output = Output(output_fmt=OutputFormat.CSV, output_rational=True).output(
+        computation, evaluation
+    )
+    assert output.splitlines() == [
+        "red,draw size,numerator,denominator",
+        "0,1,1,1",
+        "1,1,1,2",
+        "1,2,1,1",
+    ]
+
+
+def test_sweep_table():
+    computation, evaluation = make_sweep()
+    lines = Output().output(computation, evaluation).splitlines()
+    assert lines[0].split() == ["red", "draw", "size", "1", "draw", "size", "2"]
+    assert lines[2].split() == ["0", "1"]
+    assert lines[3].split() == ["1", "0.5", "1"]
+
+
+def test_heatmap_sweep():
+    computation, evaluation = make_sweep()
+    lines = Output(output_fmt=OutputFormat.HEATMAP).output(computation, evaluation)
+    assert lines.splitlines()[1:3] == ["red=0 ██", "red=1 ▒▒ ██"]
+
+
+def test_sweep_table_keeps_error_bounds():
+    computation, _ = make_sweep()
+    computation.approximate = True
+    evaluation = [[Approximation(1.0, 0.0), None], [Approximation(0.5, 1e-16), None]]
+    lines = Output().output(computation, evaluation).splitlines()
+    assert lines[3].split() == ["1", "0.5", "±", "1.0e-16"]
+
+
+def test_sweep_table_keeps_confidence_intervals():
+    computation, _ = make_sweep()
+    computation.computation_type = ComputationType.ESTIMATE
+    evaluation = [[Estimate(1.0, 0.9, 1.0), None], [Estimate(0.5, 0.4, 0.6), None]]
+    lines = Output().output(computation, evaluation).splitlines()
+    assert lines[3].split() == ["1", "0.5", "[0.4,", "0.6]"]
+
+
+def test_json():
+    computation = ComputationDescription(
+        computation_type=ComputationType.COUNT,
+        selection_range=range(1, 3),
+        collection={"red": 2},
+    )
+    output = Output(output_fmt=OutputFormat.JSON).output(computation, [2, 1])
+    assert [json.loads(line) for line in output.splitlines()] == [
+        {"draw size": 1, "count": 2},
+        {"draw size": 2, "count": 1},
+    ]
+
+
+def test_json_sweep_rational():
+    computation, evaluation = make_sweep()
+    output = Output(output_fmt=OutputFormat.JSON, output_rational=True).output(
+        computation, evaluation
+    )
+    assert [json.loads(line) for line in output.splitlines()] == [
+        {"red": 0, "draw size": 1, "numerator": 1, "denominator": 1},
+        {"red": 1, "draw size": 1, "numerator": 1, "denominator": 2},
+        {"red": 1, "draw size": 2, "numerator": 1, "denominator": 1},
+    ]
+
+
+@pytest.mark.parametrize("output_fmt", [OutputFormat.CSV, OutputFormat.JSON])
+def test_write_matches_output(output_fmt):
+    computation, evaluation = make_sweep()
+    output = Output(output_fmt=output_fmt)
+    file = io.BytesIO()
+    output.write(computation, evaluation, file)
+    assert file.getvalue().decode() == output.output(computation, evaluation) + "\n"
+
+
+def test_arrow_output_needs_file():
+    computation, evaluation = make_sweep()
+    with pytest.raises(ComputationDescriptionError, match="--output"):
+        Output(output_fmt=OutputFormat.ARROW).output(computation, evaluation)
+
+
+def test_write_arrow(monkeypatch):
+    pa = pytest.importorskip("pyarrow")
+    monkeypatch.setattr("urn.output.ARROW_BATCH_ROWS", 2)
+    computation, evaluation = make_sweep()
+    file = io.BytesIO()
+    Output(output_fmt=OutputFormat.ARROW, output_rational=True).write(
+        computation, evaluation, file
+    )
+    reader = pa.ipc.open_stream(file.getvalue())
+    assert len(list(reader)) == 2
+    table = pa.ipc.open_stream(file.getvalue()).read_all()
+    assert table.schema.types == [pa.int64()] * 4
+    assert table.to_pydict() == {
+        "red": [0, 1, 1],
+        "draw size": [1, 1, 2],
+        "numerator": [1, 1, 1],
+        "denominator": [1, 2, 1],
+    }
+
+
+def test_write_arrow_large_counts():
+    pa = pytest.importorskip("pyarrow")
+    computation = ComputationDescription(
+        computation_type=ComputationType.COUNT,
+        selection_range=range(40, 41),
+        collection={"red": 100},
+    )
+    computation.finalise()
+    file = io.BytesIO()
+    Output(output_fmt=OutputFormat.ARROW).write(computation, [comb(100, 40)], file)
+    table = pa.ipc.open_stream(file.getvalue()).read_all()
+    assert table.column("count").to_pylist() == [str(comb(100, 40))]
@@ -1,18 +1,16 @@
 import math
 
-import lark
 import pytest
 
 from urn.constraint import ConstraintItem
 from urn.computation import ComputationDescription
 from urn.constants import ComputationType, ComputationAction
-from urn.parsing import BuildComputation
+from urn.parsing import BuildComputation, make_parser, split_queries
 
 
 @pytest.fixture(scope="session")
-def parser(request):
-    rel_to = request.config.rootdir / "src" / "urn" / "grammar.lark"
-    return lark.Lark.open("grammar.lark", rel_to=rel_to)
+def parser():
+    return make_parser()
 
 
 @pytest.mark.parametrize(
@@ -88,6 +86,31 @@ def parser(request):
             ),
             id="Count draw, two constraint disjuncts",
         ),
+        pytest.param(
+            "PROBABILITY DRAW 3 FROM A=7, B=9 WHERE A >= 1 SHOW FLOAT FAST;",
+            ComputationDescription(
+                computation_type=ComputationType.PROBABILITY,
+                computation_action=ComputationAction.DRAW,
+                selection_range=range(3, 4),
+                collection={"A": 7, "B": 9},
+                constraints=[[ConstraintItem("A", 1, math.inf)]],
+                approximate=True,
+            ),
+            id="Probability draw, approximate",
+        ),
+        pytest.param(
+            "ESTIMATE DRAW 3 FROM A=7, B=9 WHERE A >= 1 SAMPLES 1000 SEED 42;",
+            ComputationDescription(
+                computation_type=ComputationType.ESTIMATE,
+                computation_action=ComputationAction.DRAW,
+                selection_range=range(3, 4),
+                collection={"A": 7, "B": 9},
+                constraints=[[ConstraintItem("A", 1, math.inf)]],
+                samples=1000,
+                seed=42,
+            ),
+            id="Estimate draw",
+        ),
         pytest.param(
             "COUNT DRAWS 2..8 FROM A=7, B=9;",
             ComputationDescription(
@@ -99,9 +122,46 @@ def parser(request):
             ),
             id="Count draw, selection range, no constraints",
         ),
+        pytest.param(
+            "PROBABILITY DRAW 5 FROM A=1..20, B=9 WHERE A >= 1;",
+            ComputationDescription(
+                computation_type=ComputationType.PROBABILITY,
+                computation_action=ComputationAction.DRAW,
+                selection_range=range(5, 6),
+                collection={"B": 9},
+                sweep={"A": range(1, 21)},
+                constraints=[[ConstraintItem("A", 1, math.inf)]],
+            ),
+            id="Probability draw, sweep over item count",
+        ),
     ],
 )
 def test_build_computation_description_from_string(parser, query, expected_computation):
     tree = parser.parse(query)
     comp = BuildComputation().transform(tree)
     assert comp.computation == expected_computation
+
+
+@pytest.mark.parametrize(
+    ["lines", "expected_queries"],
+    [
+        pytest.param(["COUNT DRAW FROM A=1;"], ["COUNT DRAW FROM A=1;"], id="one"),
+        pytest.param(
+            ["COUNT DRAW FROM A=1; COUNT DRAW\n", "FROM B=2;\n"],
+            ["COUNT DRAW FROM A=1;", " COUNT DRAW\nFROM B=2;"],
+            id="two, split across lines",
+        ),
+        pytest.param(
+            ["COUNT DRAW FROM A=1;\n", "COUNT DRAW"],
+            ["COUNT DRAW FROM A=1;", "\nCOUNT DRAW"],
+            id="unterminated final query",
+        ),
+        pytest.param(
+            ["COUNT DRAW FROM A=1;\n", "  \n"],
+            ["COUNT DRAW FROM A=1;"],
+            id="whitespace after last query",
+        ),
+    ],
+)
+def test_split_queries(lines, expected_queries):
+    assert list(split_queries(lines)) == expected_queries
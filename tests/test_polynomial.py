@@ -0,0 +1,123 @@
+import pytest
+
+from urn.polynomial import BackendError, ExponentialBackend, get_backend
+
+
+@pytest.fixture(params=["python", "gmpy2", "flint"])
+def backend(request):
+    try:
+        return get_backend(request.param)
+    except BackendError:
+        pytest.skip(f"Backend '{request.param}' is not installed")
+
+
+@pytest.mark.parametrize(
+    ["a", "b", "bound", "expected"],
+    [
+        pytest.param([1, 1], [1, 1], None, [1, 2, 1], id="(1+x)^2"),
+        pytest.param([1, 2, 1], [1, 1], None, [1, 3, 3, 1], id="(1+x)^3"),
+        pytest.param([1, 2, 1], [1, 1], 2, [1, 3], id="(1+x)^3, bound 2"),
+        pytest.param([0, 0, 6], [1, 5, 10], 3, [0, 0, 6], id="leading zeros"),
+        pytest.param([0, 0, 6], [0, 5, 10], 3, [], id="all terms above bound"),
+        pytest.param([], [1, 5, 10], None, [], id="zero polynomial"),
+    ],
+)
+def test_mul(backend, a, b, bound, expected):
+    product = backend.mul(backend.from_coeffs(a), backend.from_coeffs(b), bound)
+    coeffs = backend.to_coeffs(product)
+    # Backends may or may not keep trailing zero coefficients
+    while coeffs and coeffs[-1] == 0:
+        coeffs.pop()
+    assert coeffs == expected
+
+
+@pytest.mark.parametrize(
+    ["n_polys", "bound", "expected"],
+    [
+        pytest.param(0, None, [1], id="empty product"),
+        pytest.param(1, None, [1, 1], id="one polynomial"),
+        pytest.param(4, 3, [1, 10, 35], id="4 polynomials, bound 3"),
+        pytest.param(7, 4, [1, 28, 322, 1960], id="7 polynomials, bound 4"),
+        pytest.param(3, None, [1, 6, 11, 6], id="3 polynomials"),
+    ],
+)
+def test_product(backend, n_polys, bound, expected):
+    polys = [backend.from_coeffs([1, n]) for n in range(1, n_polys + 1)]
+    product = backend.product(polys, bound=bound)
+    assert backend.to_coeffs(product) == expected
+
+
+def test_binomial(backend):
+    assert int(backend.binomial(39, 7)) == 15380937
+    assert int(backend.binomial(3, 5)) == 0
+
+
+def test_get_backend_unknown():
+    with pytest.raises(BackendError):
+        get_backend("abacus")
+
+
+def test_get_backend_auto():
+    assert get_backend("auto").name in {"python", "gmpy2", "flint"}
+
+
+@pytest.mark.parametrize(
+    ["k", "bound", "expected"],
+    [
+        pytest.param(0, None, [1], id="k=0"),
+        pytest.param(1, None, [1, 2], id="k=1"),
+        pytest.param(5, None, [1, 10, 40, 80, 80, 32], id="k=5"),
+        pytest.param(5, 3, [1, 10, 40], id="k=5, bound 3"),
+    ],
+)
+def test_power(backend, k, bound, expected):
+    poly = backend.power(backend.from_coeffs([1, 2]), k, bound)
+    assert backend.to_coeffs(poly) == expected
+
+
+@pytest.mark.parametrize(
+    ["polys", "degree", "expected"],
+    [
+        pytest.param([], 0, 1, id="empty product, degree 0"),
+        pytest.param([], 2, 0, id="empty product, degree 2"),
+        pytest.param([[1, 1]] * 7, 3, 35, id="(1+x)^7, degree 3"),
+        pytest.param([[0, 0, 6], [1, 5, 10], [1, 3]], 4, 150, id="leading zeros"),
+        pytest.param([[1, 1], [1, 1]], 5, 0, id="degree above product"),
+    ],
+)
+def test_coefficient(backend, polys, degree, expected):
+    polys = [backend.from_coeffs(poly) for poly in polys]
+    assert backend.coefficient(polys, degree) == expected
+
+
+def test_exponential_product(backend):
+    # exp(2x) * exp(3x) * exp(5x) = exp(10x)
+    egf = ExponentialBackend(backend, bound=6)
+    polys = [egf.from_coeffs([n ** k for k in range(6)]) for n in (2, 3, 5)]
+    assert egf.to_coeffs(egf.product(polys)) == [10 ** k for k in range(6)]
+    assert egf.to_coeffs(egf.power(polys[0], 3)) == [6 ** k for k in range(6)]
+    assert egf.coefficient(polys, 4) == 10 ** 4
+
+
+def test_exponential_truncated(backend):
+    # Sequences of 3 draws from a, b with exactly one a: 3 * 1 * 1 = 3
+    egf = ExponentialBackend(backend, bound=4)
+    a = egf.from_coeffs([0, 1])
+    b = egf.from_coeffs([1, 1, 1, 1])
+    assert egf.to_coeffs(egf.mul(a, b)) == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize("bound", [None, 5])
+def test_kronecker_mul(backend, monkeypatch, bound):
+    if not hasattr(backend, "kronecker_threshold"):
+        pytest.skip(f"Backend '{backend.name}' does not use Kronecker substitution")
+    a = [int(backend.binomial(1000, k)) for k in range(6)]
+    b = [0, 3, 0, 2 ** 70]
+    expected = [
+        sum(a[i] * b[k - i] for i in range(len(a)) if 0 <= k - i < len(b))
+        for k in range(len(a) + len(b) - 1)
+    ][:bound]
+    monkeypatch.setattr(backend, "kronecker_threshold", 1)
+    monkeypatch.setattr(backend, "kronecker_max_bits", None)
+    product = backend.mul(backend.from_coeffs(a), backend.from_coeffs(b), bound)
+    assert backend.to_coeffs(product) == expected
@@ -0,0 +1,84 @@
+import pytest
+
+import urn
+from urn.evaluation import item_factor, process_query
+from urn.parsing import make_parser
+from urn.polynomial import BACKENDS, BackendError, get_backend
+from urn.profiling import Profile, active_profile, phase, profiling
+
+
+def test_phases_accumulate():
+    profile = Profile()
+    with profiling(profile):
+        with phase("evaluate"):
+            pass
+        with phase("evaluate"):
+            pass
+    assert list(profile.phases) == ["evaluate"]
+    assert profile.phases["evaluate"] >= 0
+    assert active_profile() is None
+
+
+def test_phase_without_profile():
+    with phase("evaluate"):
+        assert active_profile() is None
+
+
+def test_merge():
+    profile = Profile(terms=1, multiplications=2, max_degree=5, max_bits=10)
+    profile.merge(Profile(terms=2, multiplications=3, max_degree=3, max_bits=20))
+    assert (profile.terms, profile.multiplications) == (3, 5)
+    assert (profile.max_degree, profile.max_bits) == (5, 20)
+
+
+@pytest.mark.parametrize("name", list(BACKENDS))
+def test_backend_multiplications_are_counted(name):
+    try:
+        backend = get_backend(name)
+    except BackendError:
+        pytest.skip(f"backend {name} not installed")
+    a = backend.from_coeffs([1, 2, 1])
+    with profiling() as profile:
+        backend.mul(a, backend.mul(a, a))
+    assert profile.multiplications == 2
+    assert profile.max_degree == 6
+    assert profile.max_bits == (20).bit_length()
+
+
+def test_api_profile():
+    with urn.profiling() as profile:
+        urn.count({"red": 5, "blue": 3}, {"red": 2})
+    data = profile.as_dict()
+    assert data["terms"] == 1
+    assert data["multiplications"] > 0
+    assert {"finalise", "evaluate", "factors", "products"} <= data["phases"].keys()
+
+
+def test_show_timing():
+    query = "COUNT DRAW 3 FROM red=5, blue=3 WHERE red = 2 SHOW TIMING;"
+    result = process_query(make_parser(), query)
+    for name in ["parse", "finalise", "evaluate", "format", "multiplications"]:
+        assert name in result
+    assert "terms" in result
+
+
+def test_profile_without_show_timing():
+    profile = Profile()
+    query = "COUNT DRAW 3 FROM red=5, blue=3 WHERE red = 2;"
+    result = process_query(make_parser(), query, profile=profile)
+    assert "parse" not in result
+    assert profile.terms == 1
+    assert profile.phases.keys() == {
+        "parse", "finalise", "evaluate", "factors", "products", "format"
+    }
+
+
+def test_cached_factors_are_counted():
+    item_factor.cache_clear()
+    with urn.profiling() as first:
+        urn.count({"red": 5, "blue": 3}, {"red": 2})
+    with urn.profiling() as second:
+        urn.count({"red": 5, "blue": 3}, {"red": 2})
+    assert first.cached_factors == 0
+    assert second.cached_factors > 0
+    assert second.multiplications < first.multiplications
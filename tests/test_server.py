@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+import signal
+
+import pytest
+
+from urn.server import QueryServer, WorkerError
+
+
+@pytest.fixture
+def server():
+    server = QueryServer(jobs=1, backend="python", cache=None)
+    server.start()
+    yield server
+    server.close()
+
+
+async def request(port, method, path, content=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = b"" if content is None else json.dumps(content).encode()
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    return status, json.loads(body)
+
+
+def run_with_listener(server, client):
+    async def main():
+        listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            return await client(port)
+
+    return asyncio.run(main())
+
+
+def test_query(server):
+    async def client(port):
+        response = await request(
+            port, "POST", "/query", {"query": "COUNT DRAW 3 FROM a=4, b=5 WHERE a >= 1;"}
+        )
+        _, metrics = await request(port, "GET", "/metrics")
+        return response, metrics
+
+    (status, content), metrics = run_with_listener(server, client)
+    assert status == 200
+    assert content["error"] is None
+    assert "74" in content["result"]
+    assert metrics["requests"] == 1
+    assert metrics["latency"]["p95"] == metrics["latency"]["max"] > 0
+
+
+@pytest.mark.parametrize(
+    ["method", "path", "content", "expected_status"],
+    [
+        pytest.param("POST", "/query", {"query": "COUNT NOTHING;"}, 422, id="bad query"),
+        pytest.param("POST", "/query", {"text": "COUNT;"}, 400, id="no query"),
+        pytest.param("GET", "/query", None, 405, id="wrong method"),
+        pytest.param("GET", "/nowhere", None, 404, id="unknown path"),
+    ],
+)
+def test_bad_requests(server, method, path, content, expected_status):
+    async def client(port):
+        return await request(port, method, path, content)
+
+    status, content = run_with_listener(server, client)
+    assert status == expected_status
+    assert content["error"]
+
+
+def test_identical_queries_are_coalesced(server):
+    query = "PROBABILITY DRAW 5 FROM a=40, b=50, c=60 WHERE a >= 2 OR b = 1;"
+
+    async def client(port):
+        results = await asyncio.gather(
+            server.evaluate(query),
+            server.evaluate(query.replace(" ", "  ")),
+            server.evaluate(query),
+        )
+        _, metrics = await request(port, "GET", "/metrics")
+        return results, metrics
+
+    results, metrics = run_with_listener(server, client)
+    assert results[0] == results[1] == results[2]
+    assert metrics["requests"] == 3
+    assert metrics["coalesced"] == 2
+    assert metrics["queue_depth"] == 0
+    assert metrics["latency"]["max"] >= metrics["latency"]["p50"] > 0
+
+
+def worker_pids(server):
+    return {process.pid for process in server._executor._processes.values()}
+
+
+def test_workers_start_before_connections(server):
+    # Workers forked while handling a connection would hold its socket open
+    pids = worker_pids(server)
+    assert len(pids) == server.jobs
+
+    async def client(port):
+        return await request(port, "POST", "/query", {"query": "COUNT DRAW 1 FROM a=2;"})
+
+    status, _ = run_with_listener(server, client)
+    assert status == 200
+    assert worker_pids(server) == pids
+
+
+def test_pool_is_replaced_after_worker_dies(server):
+    query = "COUNT DRAW 1 FROM a=2;"
+    (process,) = server._executor._processes.values()
+    os.kill(process.pid, signal.SIGKILL)
+    process.join()
+
+    async def client():
+        try:
+            await server.evaluate(query)
+        except WorkerError:
+            pass
+        return await server.evaluate(query)
+
+    result, error, _ = asyncio.run(client())
+    assert error is None
+    assert "2" in result
+
+
+def test_profile():
+    server = QueryServer(jobs=1, backend="python", cache=None, profile=True)
+    server.start()
+
+    async def client(port):
+        return await request(port, "POST", "/query", {"query": "COUNT DRAW 1 FROM a=2;"})
+
+    try:
+        status, content = run_with_listener(server, client)
+    finally:
+        server.close()
+    assert status == 200
+    assert "multiplications" in content["profile"]
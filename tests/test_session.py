@@ -0,0 +1,96 @@
+import pytest
+
+from urn.computation import ComputationDescriptionError
+from urn.evaluation import process_query
+from urn.parsing import make_parser
+from urn.profiling import Profile
+from urn.session import Session, TermProducts
+
+
+@pytest.fixture(scope="module")
+def parser():
+    return make_parser()
+
+
+QUERIES = [
+    "PROBABILITY DRAW 7 FROM {} WHERE red >= 2;",
+    "PROBABILITY DRAW 7 FROM {} WHERE red >= 2 OR blue = 1;",
+    "PROBABILITY DRAW 7 FROM {} WHERE red >= 2 OR blue = 1 OR 1 < green < 4;",
+    "COUNT DRAW 2..9 FROM {} WHERE red >= 2 AND blue <= 3 OR green = 0;",
+    "COUNT DRAW 4 WITH REPLACEMENT FROM {} WHERE red = 1 OR blue = 2;",
+    "COUNT DRAW 2..5 WITH REPLACEMENT FROM {} WHERE red >= 1;",
+    "PROBABILITY DRAW 5 FROM {} WHERE red >= 2 SHOW RATIONAL;",
+]
+DECK = "red=20, blue=15, green=10, black=15"
+
+
+def test_named_collection_matches_inline(parser):
+    session = Session()
+    assert process_query(parser, f"LET deck = {DECK};", session=session) == ""
+    for query in QUERIES:
+        expected = process_query(parser, query.format(DECK))
+        assert process_query(parser, query.format("deck"), session=session) == expected
+
+
+def test_products_are_reused(parser):
+    session = Session()
+    process_query(parser, QUERIES[0].format(DECK), session=session)
+    assert session.products.hits == 0
+    profile = Profile()
+    process_query(parser, QUERIES[1].format(DECK), session=session, profile=profile)
+    assert session.products.hits == 1
+    assert profile.cached_products == 1
+
+
+def test_redefine_collection(parser):
+    session = Session()
+    process_query(parser, "LET deck = red=2, blue=2;", session=session)
+    process_query(parser, "LET deck = red=3, blue=2;", session=session)
+    result = process_query(parser, "COUNT DRAW 1 FROM deck WHERE red=1;", session=session)
+    assert result.split()[-1] == "3"
+
+
+def test_named_sweep(parser):
+    session = Session()
+    process_query(parser, "LET deck = red=1..3, blue=2;", session=session)
+    query = "COUNT DRAW 2 FROM {} WHERE red >= 1;"
+    expected = process_query(parser, query.format("red=1..3, blue=2"))
+    assert process_query(parser, query.format("deck"), session=session) == expected
+
+
+def test_unknown_collection(parser):
+    with pytest.raises(ComputationDescriptionError, match="Unknown collection"):
+        process_query(parser, "COUNT DRAW 2 FROM deck;", session=Session())
+
+
+def test_named_collection_without_session(parser):
+    with pytest.raises(ComputationDescriptionError, match="session"):
+        process_query(parser, "LET deck = red=2;")
+
+
+def test_term_products_evicts_least_recently_used():
+    products = TermProducts(max_entries=2)
+    products.put("a", [1])
+    products.put("b", [2])
+    assert products.get("a") == [1]
+    products.put("c", [3])
+    assert products.get("b") is None
+    assert products.get("a") == [1]
+    assert len(products) == 2
+    assert (products.hits, products.misses) == (2, 1)
+
+
+def test_define_from_named_collection(parser):
+    session = Session()
+    process_query(parser, "LET deck = red=2, blue=3;", session=session)
+    process_query(parser, "LET d2 = deck;", session=session)
+    query = "COUNT DRAW 2 FROM {} WHERE red = 1;"
+    expected = process_query(parser, query.format("red=2, blue=3"))
+    assert process_query(parser, query.format("d2"), session=session) == expected
+
+
+def test_define_from_unknown_collection(parser):
+    session = Session()
+    with pytest.raises(ComputationDescriptionError, match="Unknown collection"):
+        process_query(parser, "LET d2 = deck;", session=session)
+    assert "d2" not in session.collections
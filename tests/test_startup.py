@@ -0,0 +1,45 @@
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# Modules needed to parse and evaluate an exact query from the command line
+STARTUP_MODULES = ["urn.cli", "urn.shell", "urn.evaluation"]
+
+# Modules that must only be imported by the code paths that need them
+HEAVY_MODULES = ["sympy", "numpy", "tabulate", "uniplot"]
+
+# Generous limit on the cumulative import time of STARTUP_MODULES
+IMPORT_TIME_LIMIT_SECONDS = 0.5
+
+
+SRC = Path(__file__).parent.parent / "src"
+
+
+def run_python(*args):
+    env = {**os.environ, "PYTHONPATH": str(SRC)}
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, check=True, env=env
+    )
+
+
+def test_startup_does_not_import_heavy_modules():
+    code = (
+        f"import sys, {', '.join(STARTUP_MODULES)}; "
+        f"print(sorted(m for m in {HEAVY_MODULES} if m in sys.modules))"
+    )
+    assert run_python("-c", code).stdout.strip() == "[]"
+
+
+@pytest.mark.parametrize("module", STARTUP_MODULES)
+def test_startup_import_time(module):
+    # Import once first so that bytecode compilation is not measured
+    run_python("-c", f"import {module}")
+    stderr = run_python("-X", "importtime", "-c", f"import {module}").stderr
+    pattern = rf"\|\s*(\d+)\s*\|\s*{re.escape(module)}\s*$"
+    match = re.search(pattern, stderr, re.MULTILINE)
+    assert match is not None
+    assert int(match.group(1)) / 1e6 < IMPORT_TIME_LIMIT_SECONDS